@@ -0,0 +1,102 @@
+# network-economy is a simulation program for the Network Economy ABM desbribed in (TODO)
+# Copyright (C) 2020 Théo Dessertaine
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+The ``bench_import`` script
+======================
+
+Import-time benchmark of the Network Economy ABM. Each target is imported in fresh interpreters and the best wall time
+is recorded along with the heavy dependencies it loaded. The core engine must not load any of them: workers that only
+step the dynamics should pay for numpy alone, the other dependencies being imported on first use.
+
+Usage:
+    python benchmarks/bench_import.py --out benchmarks/results/import.json
+    python benchmarks/bench_import.py --baseline benchmarks/results/import.json
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+
+# Modules imported by each target, the core engine comes first
+TARGETS = {'core': ['economy', 'firms', 'household', 'dynamics'],
+           'analysis': ['continuous', 'stability', 'phase', 'profiling'],
+           'graphics': ['graphics']}
+
+# Dependencies that only saving, network generation, classification, integration or plotting may load
+HEAVY = ['pandas', 'scipy', 'networkx', 'matplotlib', 'plotly', 'community', 'numba']
+
+# Measured in a fresh interpreter, prints the import time and the heavy dependencies loaded
+PROBE = """
+import json, sys, time
+sys.path.insert(0, %r)
+start = time.perf_counter()
+for module in %r:
+    __import__(module)
+print(json.dumps({'time': time.perf_counter() - start, 'loaded': [m for m in %r if m in sys.modules]}))
+"""
+
+
+def measure(modules, repeat):
+    """
+    :param modules: modules to import,
+    :param repeat: number of fresh interpreters,
+    :return: Best import time and heavy dependencies loaded.
+    """
+    results = [json.loads(subprocess.check_output([sys.executable, '-c', PROBE % (SRC, modules, HEAVY)]))
+               for _ in range(repeat)]
+    return min(res['time'] for res in results), results[0]['loaded']
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Import-time benchmark of the Network Economy ABM.')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--out', default=None, help='file in which to save the results')
+    parser.add_argument('--baseline', default=None, help='results to compare with')
+    parser.add_argument('--threshold', type=float, default=1.5, help='ratio above which to flag')
+    args = parser.parse_args()
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    results = {}
+    regressions = 0
+    for target, modules in TARGETS.items():
+        best, loaded = measure(modules, args.repeat)
+        results[target] = {'time': best, 'loaded': loaded}
+        flag = ''
+        if target == 'core' and loaded:
+            flag = 'REGRESSION (heavy dependencies)'
+        elif baseline and target in baseline and best > args.threshold * baseline[target]['time']:
+            flag = 'REGRESSION x%.2f' % (best / baseline[target]['time'])
+        regressions += bool(flag)
+        print('%-10s %10.4fs  %-40s %s' % (target, best, ','.join(loaded) or '-', flag))
+
+    if args.out:
+        os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+        with open(args.out, 'w') as f:
+            json.dump(results, f, indent=1)
+        print('Results saved in %s' % args.out)
+    if regressions:
+        sys.exit('%d import regression(s)' % regressions)
+
+
+if __name__ == '__main__':
+    main()
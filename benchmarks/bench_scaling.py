@@ -0,0 +1,288 @@
+# network-economy is a simulation program for the Network Economy ABM desbribed in (TODO)
+# Copyright (C) 2020 Théo Dessertaine
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+The ``bench_scaling`` script
+======================
+
+Scaling benchmarks of the Network Economy ABM. Every scenario of the grid (number of firms, connectivity, network type,
+directedness, production regime, return to scale and simulation time) times network generation, economy set-up,
+equilibrium computation, dynamics, classification and plotting, and records the peak memory of each stage.
+
+Usage:
+    python benchmarks/bench_scaling.py run --n 50 100 200 --q 0 0.5 inf --out benchmarks/results/HEAD.json
+    python benchmarks/bench_scaling.py compare benchmarks/results/old.json benchmarks/results/new.json
+"""
+import argparse
+import itertools
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import dynamics  # noqa: E402
+import economy  # noqa: E402
+import network  # noqa: E402
+
+# Maximum number of random networks drawn to find one without isolated firms
+MAX_DRAWS = 1000
+
+
+def build_economy(n, d, netstring, directed, q, b, eps=0.5, seed=0):
+    """
+    Builds a benchmark economy with smallest eigenvalue of the economy matrix set to eps (for q < inf). Random
+    networks are redrawn, with successive seeds, until every firm has at least one input since production
+    functions are not defined otherwise.
+    :param n: number of firms,
+    :param d: average connectivity,
+    :param netstring: type of network,
+    :param directed: whether or not the network is directed,
+    :param q: CES parameter,
+    :param b: return to scale,
+    :param eps: smallest eigenvalue of the economy matrix,
+    :param seed: random seed,
+    :return: Economy instance with computed equilibrium.
+    """
+    for attempt in range(seed, seed + MAX_DRAWS):
+        np.random.seed(attempt)
+        random.seed(attempt)
+        eco = economy.Economy(n, d, netstring, directed, np.ones(n), 0.5 * np.ones(n), q, b)
+        if (eco.j.sum(axis=1) > 0).all():
+            break
+    else:
+        raise ValueError('No %s network without isolated firms in %d draws' % (netstring, MAX_DRAWS))
+    eco.init_house(1, np.random.uniform(0.5, 1.5, n), 1, 1)
+    eco.init_firms(np.ones(n), 0.1 * np.ones(n), 0.2, 0.1, 0.2, 0.1, 0.1)
+    eco.set_quantities()
+    if q != np.inf:
+        eco.set_eps_cal(eps)
+    else:
+        eco.compute_eq()
+    return eco
+
+
+def build_dynamics(eco, t_max):
+    """
+    :param eco: economy,
+    :param t_max: simulation time,
+    :return: Dynamics instance with initial conditions close to equilibrium.
+    """
+    dyn = dynamics.Dynamics(eco, t_max)
+    dyn.set_initial_conditions(1.05 * eco.p_eq, 1, 0.95 * eco.g_eq, eco.g_eq, np.zeros((eco.n, eco.n)), 0)
+    return dyn
+
+
+def classify(dyn):
+    """
+    Runs every classifier on the distance to equilibrium.
+    :param dyn: dynamics,
+    :return: Tuple of classifiers outputs.
+    """
+    norm = dyn.norm_prices_prods_stocks()
+    return dyn.detect_convergent(norm), dyn.detect_periodicity(norm), dyn.detect_divergent(norm)
+
+
+def plot(dyn):
+    """
+    Builds the plotly figures of the dynamics.
+    :param dyn: dynamics,
+    :return: PlotlyDynamics instance.
+    """
+    import graphics
+    plots = graphics.PlotlyDynamics(dyn)
+    plots.plotFirms()
+    plots.plotHouse()
+    return plots
+
+
+def stages(scenario):
+    """
+    Generator of the benchmark stages of a scenario. Each stage is a (name, function) pair and stages are run in
+    order since later stages use the outputs of earlier ones.
+    :param scenario: dictionary of scenario parameters,
+    :return: Generator of stages.
+    """
+    n, d, net, directed = scenario['n'], scenario['d'], scenario['net'], scenario['directed']
+    q, b, t_max = scenario['q'], scenario['b'], scenario['t_max']
+    state = {}
+    yield 'create_net', lambda: network.create_net(net, directed, n, d)
+
+    def set_up():
+        state['eco'] = build_economy(n, d, net, directed, q, b)
+    yield 'set_up', set_up
+    yield 'set_quantities', lambda: state['eco'].set_quantities()
+    yield 'compute_eq', lambda: state['eco'].compute_eq()
+
+    def run():
+        state['dyn'] = build_dynamics(state['eco'], t_max)
+        state['dyn'].discrete_dynamics()
+    yield 'discrete_dynamics', run
+    yield 'classifiers', lambda: classify(state['dyn'])
+    yield 'plotly', lambda: plot(state['dyn'])
+
+
+def run_scenario(scenario, repeat):
+    """
+    Times every stage of a scenario (best of repeat runs) and records its peak traced memory in a separate run.
+    :param scenario: dictionary of scenario parameters,
+    :param repeat: number of timed repetitions,
+    :return: List of result dictionaries.
+    """
+    results = {}
+    for _ in range(repeat):
+        for name, stage in stages(scenario):
+            res = results.setdefault(name, {'scenario': scenario, 'stage': name, 'time': np.inf, 'peak_bytes': None,
+                                            'error': None})
+            if res['error']:
+                break
+            start = time.perf_counter()
+            try:
+                stage()
+            except Exception as ex:
+                res['error'] = '%s: %s' % (type(ex).__name__, str(ex).strip().split('\n')[0])
+                break
+            res['time'] = min(res['time'], time.perf_counter() - start)
+
+    tracemalloc.start()
+    for name, stage in stages(scenario):
+        tracemalloc.reset_peak()
+        try:
+            stage()
+        except Exception:
+            break
+        results[name]['peak_bytes'] = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return list(results.values())
+
+
+def git_commit():
+    """
+    :return: Current git commit of the repository, None if unavailable.
+    """
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=os.path.dirname(os.path.abspath(__file__)),
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args):
+    grid = itertools.product(args.n, args.d, args.net, args.directed, args.q, args.b, args.t_max)
+    results = []
+    for n, d, net, directed, q, b, t_max in grid:
+        if net == 'm_regular' and not directed:
+            print('Skipping undirected m_regular networks, which are only defined directed')
+            continue
+        scenario = {'n': n, 'd': d, 'net': net, 'directed': directed, 'q': q, 'b': b, 't_max': t_max}
+        for res in run_scenario(scenario, args.repeat):
+            results.append(res)
+            print('%-70s %-18s %10.4fs %12s %s' % (scenario, res['stage'], res['time'],
+                                                   res['peak_bytes'], res['error'] or ''))
+    output = {'meta': {'commit': git_commit(),
+                       'date': time.strftime('%Y-%m-%d %H:%M:%S'),
+                       'python': platform.python_version(),
+                       'numpy': np.__version__,
+                       'machine': platform.machine(),
+                       'processor': platform.processor()},
+              'results': results}
+    out = args.out or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results',
+                                   '%s.json' % (output['meta']['commit'] or 'local')[:10])
+    errors = [res for res in results if res['error']]
+    if errors and not args.allow_errors:
+        for res in errors:
+            print('FAILED %-70s %-18s %s' % (res['scenario'], res['stage'], res['error']), file=sys.stderr)
+        sys.exit('%d stage(s) failed, no results saved (use --allow-errors to save them anyway)' % len(errors))
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, 'w') as f:
+        json.dump(output, f, indent=1, default=str)
+    print('Results saved in %s' % out)
+
+
+def key(res):
+    return json.dumps(res['scenario'], sort_keys=True, default=str), res['stage']
+
+
+def compare(args):
+    with open(args.old) as f:
+        old = {key(res): res for res in json.load(f)['results']}
+    with open(args.new) as f:
+        new = {key(res): res for res in json.load(f)['results']}
+    regressions = 0
+    for k in sorted(set(old) | set(new)):
+        if k not in new:
+            regressions += 1
+            print('%-70s %-18s missing REGRESSION' % k)
+            continue
+        if k not in old:
+            print('%-70s %-18s new %s' % (k[0], k[1], new[k]['error'] or ''))
+            continue
+        if new[k]['error']:
+            flag = 'already failing' if old[k]['error'] else 'REGRESSION'
+            regressions += not old[k]['error']
+            print('%-70s %-18s error: %s %s' % (k[0], k[1], new[k]['error'], flag))
+            continue
+        if old[k]['error']:
+            print('%-70s %-18s fixed' % k)
+            continue
+        ratio = new[k]['time'] / old[k]['time']
+        mem_old, mem_new = old[k]['peak_bytes'], new[k]['peak_bytes']
+        mem_ratio = mem_new / mem_old if mem_old and mem_new else np.nan
+        flag = 'REGRESSION' if ratio > args.threshold or mem_ratio > args.threshold else ''
+        regressions += bool(flag)
+        print('%-70s %-18s time x%6.2f  memory x%6.2f %s' % (k[0], k[1], ratio, mem_ratio, flag))
+    print('%d regression(s) above x%.2f' % (regressions, args.threshold))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Scaling benchmarks of the Network Economy ABM.')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    parser_run = sub.add_parser('run', help='run the benchmark grid')
+    parser_run.add_argument('--n', type=int, nargs='+', default=[50, 100, 200])
+    parser_run.add_argument('--d', type=int, nargs='+', default=[4])
+    parser_run.add_argument('--net', nargs='+', default=['regular', 'er'], choices=['regular', 'm_regular', 'er'])
+    parser_run.add_argument('--directed', type=lambda x: x.lower() in ('1', 'true', 'yes'), nargs='+',
+                            default=[False])
+    parser_run.add_argument('--q', type=float, nargs='+', default=[0, 0.5, np.inf])
+    parser_run.add_argument('--b', type=float, nargs='+', default=[1.])
+    parser_run.add_argument('--t_max', type=int, nargs='+', default=[100])
+    parser_run.add_argument('--repeat', type=int, default=3)
+    parser_run.add_argument('--out', default=None, help='output file, default results/<commit>.json')
+    parser_run.add_argument('--allow-errors', action='store_true', help='save results even if stages failed')
+    parser_run.set_defaults(func=run)
+
+    parser_compare = sub.add_parser('compare', help='compare two result files')
+    parser_compare.add_argument('old')
+    parser_compare.add_argument('new')
+    parser_compare.add_argument('--threshold', type=float, default=1.1, help='ratio above which to flag')
+    parser_compare.set_defaults(func=compare)
+
+    args = parser.parse_args()
+    # Non-zero exit status if the comparison found regressions (a count could wrap around modulo 256)
+    return 1 if args.func(args) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,241 @@
+# network-economy is a simulation program for the Network Economy ABM desbribed in (TODO)
+# Copyright (C) 2020 Théo Dessertaine
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+The ``golden`` script
+======================
+
+Golden-trajectory regression harness of the Network Economy ABM. Reference equilibria and trajectories of a matrix of
+scenarios are stored in a compressed npz file. It covers the three production regimes, decreasing returns to scale,
+a finite Frisch index other than 1, initial inventories of inputs (dense s0), adaptive time-stepping and fast
+adjustments far from equilibrium. Runs of the current code are compared with them:
+    - equilibria to tight per-observable tolerances,
+    - trajectories up to a short horizon, beyond which rounding differences may be amplified in chaotic regimes; the
+      time at which each observable leaves its tolerance is reported,
+    - the classification of the whole run.
+
+Economies are generated with numpy's Generator rather than networkx, so that the scenarios do not depend on the
+versions of network generators.
+
+Usage:
+    python regression/golden.py generate
+    python regression/golden.py check --scenarios q0_b1_phi1 qinf_b0.9_phi1
+"""
+import argparse
+import json
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import dynamics  # noqa: E402
+import economy  # noqa: E402
+
+GOLDEN = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'golden.npz')
+
+# Time up to which trajectories must stay within tolerance
+HORIZON = 20
+
+# Relative and absolute tolerances by observable
+TOLERANCES = {'p_eq': (1e-10, 1e-12),
+              'g_eq': (1e-10, 1e-12),
+              'mu_eq': (1e-10, 1e-12),
+              'labour_eq': (1e-10, 1e-12),
+              'utility_eq': (1e-10, 1e-12),
+              'prices': (1e-8, 1e-12),
+              'prods': (1e-8, 1e-12),
+              'wages': (1e-8, 1e-12),
+              'stocks': (1e-8, 1e-10),
+              'labour': (1e-8, 1e-12),
+              'aggregates': (1e-8, 1e-10)}
+
+EQUILIBRIA = ('p_eq', 'g_eq', 'mu_eq', 'labour_eq', 'utility_eq')
+TRAJECTORIES = ('prices', 'prods', 'wages', 'stocks', 'labour', 'aggregates')
+
+
+def scenario_matrix():
+    """
+    :return: Dictionary of scenarios by name.
+    """
+    scenarios = {}
+    for q in (0, 0.5, np.inf):
+        for b, phi in ((1, 1), (0.9, 1), (1, 2)):
+            scenarios['q%g_b%g_phi%g' % (q, b, phi)] = {'q': q, 'b': b, 'phi': phi}
+        scenarios['q%g_dense_s0' % q] = {'q': q, 'b': 1, 'phi': 1, 'dense_s0': True}
+    scenarios['q0.5_adaptive'] = {'q': 0.5, 'b': 1, 'phi': 1, 'adaptive_tol': 0.05}
+    # Fast adjustments of prices and productions, far from equilibrium and sensitive to rounding
+    scenarios['q0.5_fast'] = {'q': 0.5, 'b': 1, 'phi': 1, 'speed': 4}
+    for scenario in scenarios.values():
+        scenario.setdefault('dense_s0', False)
+        scenario.setdefault('adaptive_tol', None)
+        scenario.setdefault('speed', 1)
+        scenario.update({'n': 8, 'd': 3, 't_max': 100, 'seed': 0})
+    return scenarios
+
+
+def build_economy(scenario):
+    """
+    :param scenario: dictionary of scenario parameters,
+    :return: Economy with computed equilibrium and its random generator.
+    """
+    n, d = scenario['n'], scenario['d']
+    rng = np.random.default_rng(scenario['seed'])
+    j = np.zeros((n, n))
+    for i in range(n):
+        j[i, rng.choice(np.delete(np.arange(n), i), d, replace=False)] = 1
+    a0 = 0.5 * np.ones(n)
+    a = j * rng.uniform(0, 1, (n, n))
+    a = (1 - a0)[:, None] * a / np.sum(a, axis=1, keepdims=True)
+    eco = economy.Economy(n, d, None, True, np.ones(n), a0, scenario['q'], scenario['b'], j=j, a=a)
+    eco.init_house(1, rng.uniform(0.5, 1.5, n), 1, scenario['phi'])
+    speed = scenario['speed']
+    eco.init_firms(rng.uniform(4, 5, n), 0.1 * np.ones(n), 0.2 * speed, 0.1 * speed, 0.2 * speed, 0.1 * speed, 0.1)
+    eco.set_quantities()
+    eco.compute_eq()
+    return eco, rng
+
+
+def run_scenario(scenario):
+    """
+    :param scenario: dictionary of scenario parameters,
+    :return: Dictionary of equilibria and trajectories, with the times of the time-steps and the classification.
+    """
+    from phase import classify_dynamics
+    eco, rng = build_economy(scenario)
+    n = eco.n
+    s0 = rng.uniform(0, 0.1, (n, n)) if scenario['dense_s0'] else np.zeros(n)
+    dyn = dynamics.Dynamics(eco, scenario['t_max'], adaptive_tol=scenario['adaptive_tol'])
+    dyn.set_initial_conditions(1.05 * eco.p_eq, 1, 0.95 * eco.g_eq, eco.g_eq, s0, 0.1)
+    dyn.discrete_dynamics()
+    result = {name: np.asarray(getattr(eco, name), dtype=float) for name in EQUILIBRIA}
+    result.update({name: getattr(dyn, name)[1:-1] for name in TRAJECTORIES})
+    result['times'] = dyn.times[1:-1]
+    result['label'] = np.array(classify_dynamics(dyn))
+    return result
+
+
+def divergence_time(times, new, ref, rtol, atol):
+    """
+    :param times: times of the time-steps,
+    :param new: trajectory of the current run,
+    :param ref: reference trajectory,
+    :param rtol: relative tolerance,
+    :param atol: absolute tolerance,
+    :return: Time at which the trajectory first leaves the tolerance, None if it never does.
+    """
+    with np.errstate(all='ignore'):
+        error = np.abs(new - ref) > atol + rtol * np.abs(ref)
+    error |= np.isnan(new) != np.isnan(ref)
+    error = np.any(error.reshape((len(times), -1)), axis=1)
+    return times[np.argmax(error)] if error.any() else None
+
+
+def compare(new, ref, horizon=HORIZON):
+    """
+    :param new: results of the current run,
+    :param ref: reference results,
+    :param horizon: time up to which trajectories must stay within tolerance,
+    :return: List of failures and dictionary of divergence times by trajectory.
+    """
+    failures = []
+    for name in EQUILIBRIA:
+        rtol, atol = TOLERANCES[name]
+        if not np.allclose(new[name], ref[name], rtol=rtol, atol=atol, equal_nan=True):
+            failures.append('%s differs by %.3g' % (name, np.nanmax(np.abs(new[name] - ref[name]))))
+    times = ref['times']
+    steps = min(len(new['times']), len(times))
+    if len(new['times']) != len(times):
+        failures.append('%d time-steps instead of %d' % (len(new['times']), len(times)))
+    if not np.allclose(new['times'][:steps], times[:steps], rtol=1e-8, atol=1e-12):
+        failures.append('time-steps differ')
+    divergences = {}
+    for name in TRAJECTORIES:
+        rtol, atol = TOLERANCES[name]
+        divergences[name] = divergence_time(times[:steps], new[name][:steps], ref[name][:steps], rtol, atol)
+        if divergences[name] is not None and divergences[name] <= horizon:
+            failures.append('%s diverges at t=%g' % (name, divergences[name]))
+    if new['label'] != ref['label']:
+        failures.append('classified %s instead of %s' % (new['label'], ref['label']))
+    return failures, divergences
+
+
+def generate(path, names=None):
+    """
+    Runs the scenarios and stores their results as reference, along with the scenario parameters.
+    :param path: npz file,
+    :param names: names of the scenarios to (re)generate, default is all of them,
+    :return: side-effect
+    """
+    scenarios = scenario_matrix()
+    stored = {}
+    if names and os.path.exists(path):
+        with np.load(path) as golden:
+            stored = dict(golden)
+    for name in names if names else scenarios:
+        stored.update({'%s/%s' % (name, key): value for key, value in run_scenario(scenarios[name]).items()})
+        stored['%s/scenario' % name] = np.array(json.dumps(scenarios[name], sort_keys=True))
+        print('%s: %s' % (name, stored['%s/label' % name]))
+    np.savez_compressed(path, **stored)
+
+
+def check(path, names=None, horizon=HORIZON):
+    """
+    Compares runs of the current code with the reference results.
+    :param path: npz file,
+    :param names: names of the scenarios to check, default is all of them,
+    :param horizon: time up to which trajectories must stay within tolerance,
+    :return: Number of failed scenarios.
+    """
+    scenarios = scenario_matrix()
+    n_failed = 0
+    with np.load(path) as golden:
+        for name in names if names else scenarios:
+            if '%s/scenario' % name not in golden:
+                failures, divergences = ['no reference, run generate'], {}
+            elif str(golden['%s/scenario' % name]) != json.dumps(scenarios[name], sort_keys=True):
+                failures, divergences = ['scenario changed, run generate'], {}
+            else:
+                ref = {key.split('/', 1)[1]: golden[key] for key in golden.files if key.startswith(name + '/')}
+                failures, divergences = compare(run_scenario(scenarios[name]), ref, horizon)
+            late = ', '.join('%s at t=%g' % (key, t) for key, t in divergences.items() if t is not None)
+            print('%-20s %s%s' % (name, 'FAIL' if failures else 'ok', ' (diverges: %s)' % late if late else ''))
+            for failure in failures:
+                print('    ' + failure)
+            n_failed += bool(failures)
+    return n_failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Golden-trajectory regression harness of the Network Economy ABM.')
+    parser.add_argument('command', choices=['generate', 'check'])
+    parser.add_argument('--golden', default=GOLDEN, help='npz file of reference results')
+    parser.add_argument('--scenarios', nargs='+', default=None, help='names of scenarios, default is all of them')
+    parser.add_argument('--horizon', type=float, default=HORIZON,
+                        help='time up to which trajectories must stay within tolerance')
+    args = parser.parse_args()
+    if args.command == 'generate':
+        generate(args.golden, args.scenarios)
+    else:
+        n_failed = check(args.golden, args.scenarios, args.horizon)
+        if n_failed:
+            print('%d scenario(s) failed' % n_failed)
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,197 @@
+# network-economy is a simulation program for the Network Economy ABM desbribed in (TODO)
+# Copyright (C) 2020 Théo Dessertaine
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+The ``accumulators`` module
+======================
+
+This module declares online accumulators of summary statistics of the dynamics: Welford moments, running extrema,
+lagged products (autocorrelations) and the distance to equilibrium. Accumulators are given to the Dynamics class,
+which updates them with the state of every completed time-step, so that summaries of a run do not require its
+trajectory. Each accumulator follows a channel, the name of a time-series of the Dynamics class ('prices', 'prods',
+'stocks', 'wages', 'labour', ...) or a function of the dynamics and of the time-step, and only accumulates time-steps
+from a given start time on. With adaptive time-stepping, every accepted time-step has the same weight.
+"""
+import numpy as np
+
+
+def channel_value(dyn, channel, t):
+    """
+    :param dyn: dynamics,
+    :param channel: name of a time-series or function of the dynamics and of the time-step,
+    :param t: time-step,
+    :return: Value of the channel at time-step t.
+    """
+    if callable(channel):
+        return np.array(channel(dyn, t), dtype=float)
+    return np.array(getattr(dyn, channel)[t], dtype=float)
+
+
+class Accumulator(object):
+
+    def __init__(self, channel, start=0):
+        """
+        :param channel: name of a time-series or function of the dynamics and of the time-step,
+        :param start: time from which time-steps are accumulated.
+        """
+        self.channel = channel
+        self.start = start
+        self.reset()
+
+    def reset(self):
+        self.count = 0  # Number of accumulated time-steps
+
+    def update(self, dyn, t):
+        """
+        :param dyn: dynamics,
+        :param t: completed time-step,
+        :return: side-effect
+        """
+        if dyn.times[t] >= self.start:
+            self.add(channel_value(dyn, self.channel, t))
+
+    def add(self, x):
+        self.count += 1
+
+    def result(self):
+        raise NotImplementedError
+
+
+class Moments(Accumulator):
+
+    def reset(self):
+        super().reset()
+        self.mean = 0
+        self.m2 = 0  # Sum of squared deviations from the mean
+
+    def add(self, x):
+        super().add(x)
+        delta = x - self.mean
+        self.mean = self.mean + delta / self.count
+        self.m2 = self.m2 + delta * (x - self.mean)
+
+    def result(self):
+        """
+        :return: Dictionary of the number of time-steps, mean and (population) variance.
+        """
+        return {'count': self.count, 'mean': self.mean, 'var': self.m2 / self.count if self.count else np.nan}
+
+
+class Extrema(Accumulator):
+
+    def reset(self):
+        super().reset()
+        self.min = np.inf
+        self.max = - np.inf
+
+    def add(self, x):
+        super().add(x)
+        self.min = np.fmin(self.min, x)
+        self.max = np.fmax(self.max, x)
+
+    def result(self):
+        """
+        :return: Dictionary of the number of time-steps, minimum and maximum.
+        """
+        return {'count': self.count, 'min': self.min, 'max': self.max}
+
+
+class LaggedProducts(Accumulator):
+
+    def __init__(self, channel, lags=(1, 2, 5), start=0):
+        """
+        :param channel: name of a time-series or function of the dynamics and of the time-step,
+        :param lags: lags, in time-steps, of the autocorrelations,
+        :param start: time from which time-steps are accumulated.
+        """
+        self.lags = tuple(lags)
+        super().__init__(channel, start)
+
+    def reset(self):
+        super().reset()
+        self.moments = Moments(None)
+        self.history = []  # Values of the last max(lags) time-steps, most recent last
+        # Number of pairs, sums of products, of leading and lagged values and of their squares, at each lag
+        self.pairs = {lag: [0, 0, 0, 0, 0, 0] for lag in self.lags}
+
+    def add(self, x):
+        super().add(x)
+        self.moments.add(x)
+        for lag in self.lags:
+            if len(self.history) >= lag:
+                lagged = self.history[- lag]
+                pair = self.pairs[lag]
+                pair[0] += 1
+                pair[1] = pair[1] + x * lagged
+                pair[2] = pair[2] + x
+                pair[3] = pair[3] + lagged
+                pair[4] = pair[4] + x * x
+                pair[5] = pair[5] + lagged * lagged
+        self.history.append(x)
+        if len(self.history) > max(self.lags):
+            self.history.pop(0)
+
+    def result(self):
+        """
+        :return: Dictionary of the number of time-steps, mean, variance and autocorrelations (Pearson correlations of
+        the pairs of values at each lag) by lag.
+        """
+        result = self.moments.result()
+        result['autocorrelations'] = {}
+        with np.errstate(all='ignore'):
+            for lag, (count, products, leading, lagged, leading2, lagged2) in self.pairs.items():
+                covariance = products / count - leading / count * lagged / count
+                variances = ((leading2 / count - np.square(leading / count))
+                             * (lagged2 / count - np.square(lagged / count)))
+                result['autocorrelations'][lag] = covariance / np.sqrt(variances) if count else np.nan
+        return result
+
+
+class DistanceToEquilibrium(Accumulator):
+
+    def __init__(self, start=0):
+        """
+        Running norm of the distance of prices and productions to equilibrium, together with stocks, as in
+        Dynamics.norm_prices_prods_stocks.
+        :param start: time from which time-steps are accumulated.
+        """
+        super().__init__(self.distance, start)
+
+    @staticmethod
+    def distance(dyn, t):
+        return np.sqrt(np.sum(np.square(dyn.prices[t] - dyn.eco.p_eq)) + np.sum(np.square(dyn.prods[t] - dyn.eco.g_eq))
+                       + np.sum(np.square(dyn.stocks[t])))
+
+    def reset(self):
+        super().reset()
+        self.moments = Moments(None)
+        self.extrema = Extrema(None)
+        self.last = np.nan
+
+    def add(self, x):
+        super().add(x)
+        self.moments.add(x)
+        self.extrema.add(x)
+        self.last = x
+
+    def result(self):
+        """
+        :return: Dictionary of the number of time-steps, mean, variance, minimum, maximum and last distance.
+        """
+        result = self.moments.result()
+        result.update(self.extrema.result())
+        result['last'] = self.last
+        return result
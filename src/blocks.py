@@ -0,0 +1,121 @@
+# network-economy is a simulation program for the Network Economy ABM desbribed in (TODO)
+# Copyright (C) 2020 Théo Dessertaine
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+The ``blocks`` module
+======================
+
+This module declares the BlockSolver class which solves the linear systems of the equilibrium of modular economies
+by community. The economy matrix is partitioned along communities of the network (Louvain communities by default),
+its diagonal blocks are factorized in parallel and the blocks are coupled through the few links between communities
+by block-Jacobi (parallel) or block Gauss-Seidel (sequential, fewer iterations) iterations. The coupling only uses
+the per-edge tables of the economy, so that each iteration costs the factorized block solves plus the number of
+links between communities. Iterations converge for productive economies, whose economy matrix is an M-matrix.
+"""
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+
+def louvain_blocks(e, seed=None):
+    """
+    Partitions the firms of an economy into Louvain communities of its input-output network.
+    :param e: economy class,
+    :param seed: random state of the Louvain algorithm,
+    :return: List of arrays of the firms of each community.
+    """
+    import networkx as nx
+    from community import community_louvain
+    goods = e.edge_cols > 0
+    g = nx.Graph()
+    g.add_nodes_from(range(e.n))
+    g.add_weighted_edges_from(zip(e.edge_rows[goods], e.edge_cols[goods] - 1, np.abs(e.edge_lamb[goods])))
+    partition = community_louvain.best_partition(g, random_state=seed)
+    labels = np.array([partition[i] for i in range(e.n)])
+    return [np.nonzero(labels == c)[0] for c in np.unique(labels)]
+
+
+class BlockSolver(object):
+
+    def __init__(self, e, blocks=None, workers=None):
+        """
+        Factorizes the diagonal blocks of the economy matrix.
+        :param e: economy class, with set quantities,
+        :param blocks: list of arrays of firms partitioning the economy, default is its Louvain communities,
+        :param workers: number of threads solving the blocks, default is the number of processors,
+        """
+        from scipy.linalg import lu_factor
+        self.n = e.n
+        self.blocks = blocks if blocks is not None else louvain_blocks(e)
+        self.workers = workers
+        block_of = np.zeros(self.n, dtype=int)
+        position = np.zeros(self.n, dtype=int)  # Position of each firm in its block
+        for c, block in enumerate(self.blocks):
+            block_of[block] = c
+            position[block] = np.arange(len(block))
+
+        # Entries of the economy matrix, - lamb, coupling different blocks, grouped by block of their row (column for
+        # the transpose) with the position of that row in the block
+        goods = e.edge_cols > 0
+        rows, cols, values = e.edge_rows[goods], e.edge_cols[goods] - 1, - e.edge_lamb[goods]
+        cross = block_of[rows] != block_of[cols]
+        rows, cols, values = rows[cross], cols[cross], values[cross]
+        self.cross = [[(position[r[block_of[r] == c]], o[block_of[r] == c], values[block_of[r] == c])
+                       for c in range(len(self.blocks))] for r, o in ((rows, cols), (cols, rows))]
+
+        with ThreadPoolExecutor(self.workers) as executor:
+            self.factors = list(executor.map(lambda block: lu_factor(e.m_cal[np.ix_(block, block)]), self.blocks))
+
+    def solve_block(self, c, rhs, x, transpose):
+        """
+        :param c: index of the block,
+        :param rhs: right-hand side,
+        :param x: current solution, used for the other blocks,
+        :param transpose: whether or not to use the transpose of the economy matrix,
+        :return: Solution of the diagonal block given the current solution on the other blocks.
+        """
+        from scipy.linalg import lu_solve
+        local_rows, others, values = self.cross[transpose][c]
+        b = rhs[self.blocks[c]] - np.bincount(local_rows, weights=values * x[others], minlength=len(self.blocks[c]))
+        return lu_solve(self.factors[c], b, trans=1 if transpose else 0)
+
+    def solve(self, rhs, transpose=False, method='jacobi', tol=1e-12, max_iter=1000):
+        """
+        Solves a linear system of the economy matrix by block iterations.
+        :param rhs: right-hand side,
+        :param transpose: whether or not to solve the system of the transpose of the economy matrix,
+        :param method: 'jacobi' to solve the blocks of an iteration in parallel, 'gauss-seidel' to solve them in
+        sequence with the latest values of the other blocks,
+        :param tol: relative change of the solution at which iterations stop,
+        :param max_iter: maximum number of iterations,
+        :return: Solution and number of iterations.
+        """
+        x = np.zeros(self.n)
+        with ThreadPoolExecutor(self.workers) as executor:
+            for iteration in range(1, max_iter + 1):
+                x_old = x.copy()
+                if method == 'jacobi':
+                    for block, y in zip(self.blocks, executor.map(lambda c: self.solve_block(c, rhs, x_old, transpose),
+                                                                  range(len(self.blocks)))):
+                        x[block] = y
+                elif method == 'gauss-seidel':
+                    for c, block in enumerate(self.blocks):
+                        x[block] = self.solve_block(c, rhs, x, transpose)
+                else:
+                    raise ValueError('Unknown method %s' % method)
+                if np.linalg.norm(x - x_old) <= tol * np.linalg.norm(x):
+                    return x, iteration
+        raise ArithmeticError('Block iterations did not converge in %d iterations' % max_iter)
@@ -0,0 +1,104 @@
+# network-economy is a simulation program for the Network Economy ABM desbribed in (TODO)
+# Copyright (C) 2020 Théo Dessertaine
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+The ``continuous`` module
+======================
+
+This module declares the ContinuousDynamics class which integrates the naive continuous-time limit of the Network
+Economy ABM. When the size of time-steps goes to zero, the exponents of the price, wage and target updates of the
+Firms class become the log-derivatives of prices, wage and productions. In this naive limit firms produce their
+targets without inventories, every demand is met, the household keeps constant savings and confidence effects vanish.
+The resulting ODE system is integrated with an adaptive solver and stored in the time-series of the Dynamics class.
+"""
+import numpy as np
+
+from dynamics import Dynamics
+
+
+class ContinuousDynamics(Dynamics):
+
+    def __init__(self, e, t_max, step_size=None, method=None, rtol=None, atol=None, store=None, profiler=None):
+        super().__init__(e, t_max, step_size=step_size, store=store, profiler=profiler)
+        self.method = method if method else 'LSODA'  # Integration method of scipy's solve_ivp
+        self.rtol = rtol if rtol else 1e-6  # Relative tolerance of the solver
+        self.atol = atol if atol else 1e-9  # Absolute tolerance of the solver
+        self.n_evaluations = None  # Number of evaluations of the right-hand side during the last integration
+        self.solver_message = None  # Termination message of the solver
+
+    def flows(self, prices, prods):
+        """
+        Instantaneous exchanges of the continuous limit, where firms produce their targets, post the corresponding
+        optimal demands and every demand is met.
+        :param prices: wage-rescaled prices,
+        :param prods: production levels,
+        :return: Edge-list of exchanged quantities, supply and demand of labour and goods.
+        """
+        cons, labour = self.eco.house.compute_demand_cons_labour_supply(self.savings, prices, 1, 1, 0)
+        q = np.concatenate((self.aggregate_households(cons),
+                            self.eco.firms.compute_optimal_quantities(prods, prices, self.eco)))
+        supply = np.concatenate(([np.sum(labour)], self.eco.firms.z * prods))
+        return q, supply, self.eco.column_sums(q)
+
+    def rhs(self, t, y):
+        """
+        Right-hand side of the continuous limit, the exponents of Firms.update_prices, Firms.update_wages and
+        Firms.compute_targets per unit of time.
+        :param t: time,
+        :param y: state made of log-prices (wage-rescaled), log-productions and log-wage,
+        :return: Time-derivative of the state.
+        """
+        firms = self.eco.firms
+        prices, prods = np.exp(y[:self.n]), np.exp(y[self.n:2 * self.n])
+        q, supply, demand = self.flows(prices, prods)
+        profits, balance, cashflow, tradeflow = firms.compute_profits_balance(prices, q, supply, demand, self.eco)
+        d_wage = - 2 * firms.omega * balance[0] / tradeflow[0]
+        d_prices = - 2 * (firms.alpha_p * profits / cashflow + firms.alpha * balance[1:] / tradeflow[1:]) - d_wage
+        d_prods = 2 * (firms.beta * profits / cashflow - firms.beta_p * balance[1:] / tradeflow[1:])
+        return np.concatenate((d_prices, d_prods, [d_wage]))
+
+    def continuous_dynamics(self):
+        """
+        Integrates the continuous limit from the initial prices, wage and productions and stores the solution at the
+        times of the time-series. Initial targets and inventories are not used. Time-steps the solver could not reach,
+        for instance after a blow-up, are filled with nans.
+        :return: Side-effect
+        """
+        from scipy.integrate import solve_ivp
+        self.clear_all()
+        self.savings = self.B0 / self.w0
+        y0 = np.concatenate((np.log(self.p0 / self.w0), np.log(self.g0), [np.log(self.w0)]))
+        with self.phase('integration'):
+            sol = solve_ivp(self.rhs, (self.times[1], self.times[-1]), y0, method=self.method,
+                            t_eval=self.times[1:], rtol=self.rtol, atol=self.atol)
+        self.n_evaluations = sol.nfev
+        self.solver_message = sol.message
+
+        end = 1 + sol.y.shape[1]
+        self.prices[1:end] = np.exp(sol.y[:self.n].T)
+        self.prods[1:end] = np.exp(sol.y[self.n:2 * self.n].T)
+        self.prices_non_res[1:end] = np.exp(sol.y[:self.n].T + sol.y[-1][:, None])
+        self.wages[1] = self.w0
+        self.wages[2:end] = np.exp(np.diff(sol.y[-1]))
+        self.targets[1:end] = self.prods[1:end]
+        for t in range(1, end):
+            q, supply, _ = self.flows(self.prices[t], self.prods[t])
+            self.q_demand[t] = q
+            self.q_exchange[t] = q
+            self.labour[t] = supply[0]
+        for name in ('prices', 'prices_non_res', 'wages', 'prods', 'targets', 'q_demand', 'q_exchange', 'labour'):
+            getattr(self, name)[end:] = np.nan
+        self.run_with_current_ic = True
@@ -22,47 +22,106 @@ This module declares the Dynamics class which simulate the dynamics of the Netwo
 
 
 import warnings
+from contextlib import nullcontext
+
 import numpy as np
-import pandas as pd
 
-from numba import jit
-from scipy.signal import periodogram
-from scipy.special.cython_special import binom
+from recording import RingSeries
 
 warnings.simplefilter("ignore")
 
+# Context manager used for phases when the dynamics is not profiled
+NO_PROFILING = nullcontext()
+
 
 class Dynamics(object):
-    def __init__(self, e, t_max, step_size=None, lda=None, nu=None, store=None):
+
+    # Time-series instances, indexed by time-step
+    time_series = ('times', 'prices', 'prices_non_res', 'wages', 'prods', 'targets', 'stocks', 'edge_stocks',
+                   'q_exchange', 'q_demand', 'labour', 'utilities', 'budgets', 'aggregates')
+
+    # Columns of the table of macroeconomic aggregates, wage-rescaled
+    aggregate_columns = ('nominal_output', 'real_output', 'price_index', 'labour_tension', 'inventories', 'profits')
+
+    def __init__(self, e, t_max, step_size=None, lda=None, nu=None, store=None, profiler=None, adaptive_tol=None,
+                 step_bounds=None, accumulators=None, recording=None, noise=None):
         self.eco = e  # Economy for which to run the simulations
         self.t_max = t_max  # End time of the simulation
         self.n = self.eco.n  # Number of firms
-        self.step_s = step_size if step_size else 1  # Size of on time step
-
-        # Initialization of time-series
-        self.prices = np.zeros((int((t_max + 1) / self.step_s), self.n))
-        self.prices_non_res = np.zeros((int((t_max + 1) / self.step_s), self.n))
-        self.wages = np.zeros(int((t_max + 1) / self.step_s))
-        self.prods = np.zeros((int((t_max + 1) / self.step_s), self.n))
-        self.targets = np.zeros((int((t_max + 1) / self.step_s), self.n))
-        self.stocks = np.zeros((int((t_max + 1) / self.step_s), self.n, self.n))
-        self.gains = np.zeros((int((t_max + 1) / self.step_s), self.n))
-        self.losses = np.zeros((int((t_max + 1) / self.step_s), self.n))
-        self.supply = np.zeros((int((t_max + 1) / self.step_s), self.n + 1))
-        self.demand = np.zeros((int((t_max + 1) / self.step_s), self.n + 1))
+        self.step_size = step_size if step_size else 1  # Size of the first time step
+        self.step_s = self.step_size  # Size of the current time step
+
+        # Adaptive time-stepping: tolerance on the relative change of prices, productions and wage over one step,
+        # None for a constant step size, and lower and upper bounds on the step size
+        self.adaptive_tol = adaptive_tol
+        self.step_bounds = step_bounds if step_bounds else (self.step_size / 100, 1)
+        self.floor_steps = 0  # Number of steps exceeding the tolerance accepted at the lower bound of the step size
+        length = int((t_max + 1) / (self.step_bounds[1] if adaptive_tol else self.step_s))
+
+        # Optional recording specification, in which case time-series other than times are working buffers of the
+        # last time-steps and the recorded time-steps are copied in records
+        self.recording = recording
+        self.record_columns = None
+        self.records = None
+        self.record_steps = None
+
+        # Initialization of time-series, the times of the time-steps being uniform unless the step size is adaptive
+        self.times = np.arange(length, dtype=float) * self.step_s
+        self.prices = self.new_series(length, (self.n,))
+        self.prices_non_res = self.new_series(length, (self.n,))
+        self.wages = self.new_series(length)
+        self.prods = self.new_series(length, (self.n,))
+        self.targets = self.new_series(length, (self.n,))
+        # Exchanged and demanded quantities are stored as edge-lists: the n consumptions of the household(s) followed
+        # by the m quantities along the edges of the economy's augmented network (labour and inputs of the firms)
+        self.m = None
+        self.labour_idx = None
+        self.labour_rows = None
+        self.goods_idx = None
+        self.goods_cols = None
+        # Inventories are stored compactly: firms' own goods and, in the Leontief regime, inputs along network edges
+        self.stock_edges = None
+        self.stock_cols = None
+        # Inventories of inputs given in the initial conditions, which are only used at the first time-step when
+        # they are not otherwise stored
+        self.initial_input_stocks = None
+        self.set_edges()
+        self.stocks = self.new_series(length, (self.n,))
+        self.edge_stocks = self.new_series(length, (len(self.stock_edges),))
+        self.gains = np.zeros(self.n)
+        self.losses = np.zeros(self.n)
+        self.supply = np.zeros(self.n + 1)
+        self.demand = np.zeros(self.n + 1)
         self.tradereal = np.zeros(self.n + 1)
-        self.q_exchange = np.zeros((int((t_max + 1) / self.step_s), self.n + 1, self.n + 1))
-        self.q_demand = np.zeros((int((t_max + 1) / self.step_s), self.n + 1, self.n + 1))
-        self.q_opt = np.zeros((self.n, self.n + 1))
-        self.q_prod = np.zeros((self.n, self.n + 1))
-        self.q_used = np.zeros((self.n, self.n + 1))
+        self.q_exchange = self.new_series(length, (self.n + self.m,))
+        self.q_demand = self.new_series(length, (self.n + self.m,))
+        self.q_opt = np.zeros(self.m)
+        self.q_prod = np.zeros(self.m)
+        self.q_used = np.zeros(self.m)
         self.budget = 0
         self.savings = 0
-        self.labour = np.zeros(int((t_max + 1) / self.step_s))
+        self.labour = self.new_series(length)
+        # Utility and wage-rescaled budget of each household
+        self.utilities = self.new_series(length, (np.size(self.eco.house.l_0),))
+        self.budgets = self.new_series(length, (np.size(self.eco.house.l_0),))
+        # Macroeconomic aggregates of every time-step, stored in full even with a recording
+        self.aggregates = np.zeros((length, len(self.aggregate_columns)))
+        self.clear_records()
+        self.cons_targets = None  # Consumption targets of the household(s) for the current period
+        self.labour_offers = None  # Labour supply of the household(s) for the current period
 
         # Whether to store the dynamics in a h5 format
         self.store = store
 
+        # Optional profiler recording the time spent in each phase of the dynamics
+        self.profiler = profiler
+
+        # Online accumulators of summary statistics, updated with the state of every time-step
+        self.accumulators = list(accumulators) if accumulators else []
+
+        # Optional per-step multiplicative shocks on productivity factors, preferences and labour supply
+        self.noise = noise
+
         # Declare initial conditions instances
         self.p0 = None
         self.w0 = None
@@ -72,6 +131,7 @@ class Dynamics(object):
         self.B0 = None
 
         self.run_with_current_ic = False
+        self.current_t = None  # Last time-step whose production and household optimization were carried out
         self.nu = nu if nu else 1
         self.lda = lda if lda else 1
 
@@ -83,25 +143,61 @@ class Dynamics(object):
         """
         if t_max:
             self.t_max = t_max
-        self.prices = np.zeros(self.prices.shape)
-        self.prices_non_res = np.zeros(self.prices_non_res.shape)
-        self.wages = np.zeros(self.wages.shape)
-        self.prods = np.zeros(self.prods.shape)
-        self.targets = np.zeros(self.targets.shape)
-        self.stocks = np.zeros(self.stocks.shape)
+        self.step_s = self.step_size
+        self.floor_steps = 0
+        length = len(self.prices)
+        self.times = np.arange(length, dtype=float) * self.step_s
+        self.prices = self.new_series(length, (self.n,))
+        self.prices_non_res = self.new_series(length, (self.n,))
+        self.wages = self.new_series(length)
+        self.prods = self.new_series(length, (self.n,))
+        self.targets = self.new_series(length, (self.n,))
+        self.set_edges()
+        self.stocks = self.new_series(length, (self.n,))
+        self.edge_stocks = self.new_series(length, (len(self.stock_edges),))
         self.gains = np.zeros(self.gains.shape)
         self.losses = np.zeros(self.losses.shape)
         self.supply = np.zeros(self.supply.shape)
         self.demand = np.zeros(self.demand.shape)
         self.tradereal = np.zeros(self.tradereal.shape)
-        self.q_exchange = np.zeros(self.q_exchange.shape)
-        self.q_demand = np.zeros(self.q_demand.shape)
-        self.q_opt = np.zeros(self.q_opt.shape)
-        self.q_prod = np.zeros(self.q_prod.shape)
-        self.q_used = np.zeros(self.q_used.shape)
+        self.q_exchange = self.new_series(length, (self.n + self.m,))
+        self.q_demand = self.new_series(length, (self.n + self.m,))
+        self.q_opt = np.zeros(self.m)
+        self.q_prod = np.zeros(self.m)
+        self.q_used = np.zeros(self.m)
         self.budget = 0
         self.savings = 0
-        self.labour = np.zeros(self.labour.shape)
+        self.labour = self.new_series(length)
+        self.utilities = self.new_series(length, (np.size(self.eco.house.l_0),))
+        self.budgets = self.new_series(length, (np.size(self.eco.house.l_0),))
+        self.aggregates = np.zeros((length, len(self.aggregate_columns)))
+        self.cons_targets = None
+        self.labour_offers = None
+        self.initial_input_stocks = None
+        self.current_t = None
+        for accumulator in self.accumulators:
+            accumulator.reset()
+        self.clear_records()
+
+    def new_series(self, length, shape=()):
+        """
+        :param length: number of time-steps,
+        :param shape: shape of the time-series at each time-step,
+        :return: Empty time-series, or working buffer of its last time-steps if the dynamics is given a recording.
+        """
+        if self.recording:
+            return RingSeries(length, shape)
+        return np.zeros((length,) + tuple(shape))
+
+    def clear_records(self):
+        """
+        Empties the recorded time-series.
+        :return: side-effect
+        """
+        if self.recording:
+            self.record_columns = self.recording.columns(self)
+            self.records = {name: [] for name in self.record_columns}
+            self.record_steps = []
 
     # Setters for simulation parameters
 
@@ -111,6 +207,7 @@ class Dynamics(object):
         self.run_with_current_ic = False
 
     def update_step_size(self, step_size):
+        self.step_size = step_size
         self.step_s = step_size
         self.clear_all(self.t_max)
         self.run_with_current_ic = False
@@ -118,10 +215,127 @@ class Dynamics(object):
     def update_lambda(self, lda):
         self.lda = lda
         self.run_with_current_ic = False
+
+    def set_adaptive(self, adaptive_tol, step_bounds=None):
+        """
+        Switches adaptive time-stepping on, or off with a None tolerance.
+        :param adaptive_tol: tolerance on the largest relative change of prices, productions and wage over one step,
+        :param step_bounds: lower and upper bounds on the step size,
+        :return: side-effect
+        """
+        self.adaptive_tol = adaptive_tol
+        if step_bounds:
+            self.step_bounds = step_bounds
+        self.run_with_current_ic = False
+
+    def set_recording(self, recording):
+        """
+        Sets the recording specification, None to store every time-series in full, and clears the time-series.
+        :param recording: Recording instance or None,
+        :return: side-effect
+        """
+        self.recording = recording
+        self.clear_all()
+        self.run_with_current_ic = False
+
+    def set_profiler(self, profiler):
+        """
+        Attaches a profiler to the dynamics, None to disable profiling.
+        :param profiler: StepProfiler instance or None,
+        :return: side-effect
+        """
+        self.profiler = profiler
+
     # Setters for the economy
 
     def update_eco(self, e):
         self.eco = e
+        self.clear_all()
+
+    def set_edges(self):
+        """
+        Sets the indices used to address the edge-lists of exchanged and demanded quantities. Inventories of inputs
+        only remain with a Leontief production function, in which case they are stored for every (firm, input) edge
+        of the network other than the firms' own goods.
+        :return: side-effect
+        """
+        rows, cols = self.eco.edge_rows, self.eco.edge_cols
+        self.m = len(rows)
+        self.labour_idx = self.n + np.nonzero(cols == 0)[0]
+        self.labour_rows = rows[cols == 0]
+        self.goods_idx = self.n + np.nonzero(cols > 0)[0]
+        self.goods_cols = cols[cols > 0] - 1
+        if self.eco.q == 0:
+            self.stock_edges = np.nonzero((cols > 0) & (cols - 1 != rows))[0]
+        else:
+            self.stock_edges = np.zeros(0, dtype=int)
+        self.stock_cols = cols[self.stock_edges] - 1
+
+    def input_stocks(self, t):
+        """
+        :param t: time-step,
+        :return: Inventories of inputs held by the firms at time t along the edges of the network.
+        """
+        if t == 1 and self.initial_input_stocks is not None:
+            return self.initial_input_stocks
+        stocks = np.zeros(self.m)
+        stocks[self.stock_edges] = self.edge_stocks[t]
+        return stocks
+
+    def dense_matrix(self, q):
+        """
+        Reconstructs the dense (n+1, n+1) matrices from edge-lists of exchanged or demanded quantities, where row 0
+        holds consumptions and column 0 labour.
+        :param q: edge-list or time-series of edge-lists,
+        :return: Dense matrix or time-series of dense matrices.
+        """
+        q = np.asarray(q)
+        dense = np.zeros(q.shape[:-1] + (self.n + 1, self.n + 1))
+        dense[..., 0, 1:] = q[..., :self.n]
+        dense[..., self.eco.edge_rows + 1, self.eco.edge_cols] = q[..., self.n:]
+        return dense
+
+    # Stochastic shocks
+
+    def shocks(self, channel, t, size):
+        """
+        :param channel: shocked quantity, one of 'z', 'theta' or 'labour',
+        :param t: time-step,
+        :param size: number of firms (or households),
+        :return: Multiplicative shocks of the time-step, None if the dynamics is deterministic or the quantity is not
+        shocked.
+        """
+        return self.noise.factors(channel, t, size, self.step_s) if self.noise else None
+
+    def productivity(self, t):
+        """
+        :param t: time-step,
+        :return: Productivity factors of the firms at time-step t.
+        """
+        shocks = self.shocks('z', t, self.n)
+        return self.eco.firms.z if shocks is None else self.eco.firms.z * shocks
+
+    def productivities(self):
+        """
+        Realised productivity factors across time, recomputed from the counter-based streams of the noise. With
+        adaptive time-stepping the step sizes are recovered from the times of the time-steps, up to rounding.
+        :return: Time-series of the productivity factors of the firms.
+        """
+        z = np.broadcast_to(self.eco.firms.z, (len(self.times), self.n))
+        if not (self.noise and self.noise.volatilities['z']):
+            return z
+        steps = np.append(np.diff(self.times), self.step_s) if self.adaptive_tol else np.full(len(self.times),
+                                                                                               self.step_s)
+        return z * np.array([self.noise.factors('z', t, self.n, step) for t, step in enumerate(steps)])
+
+    def shock_labour(self, t, labour_offers):
+        """
+        :param t: time-step,
+        :param labour_offers: labour supply of the household(s) for time-step t,
+        :return: Shocked labour supply.
+        """
+        shocks = self.shocks('labour', t, np.size(labour_offers))
+        return labour_offers if shocks is None else labour_offers * shocks.reshape(np.shape(labour_offers))
 
     # Setters for initial conditions
 
@@ -160,6 +374,13 @@ class Dynamics(object):
 
     # Dynamical methods
 
+    def phase(self, name):
+        """
+        :param name: name of a phase of the dynamics,
+        :return: Context manager recording the phase if the dynamics is profiled, an empty context manager otherwise.
+        """
+        return self.profiler.phase(name) if self.profiler else NO_PROFILING
+
     def planning(self, t):
         """
         Performs all the actions the Planning step. Firms forecast gains, losses, supplies and demands (in the
@@ -170,26 +391,25 @@ class Dynamics(object):
         """
 
         # (1) - (2) Forecasts and production targets
-        self.supply = np.concatenate(
-            ([self.labour[t]], self.eco.firms.z * self.prods[t] + np.diagonal(self.stocks[t])))
-
-        self.targets[t + 1] = self.eco.firms.compute_targets(self.prices[t],
-                                                             self.lda * self.q_demand[t - 1] +
-                                                             (1 - self.lda) * self.q_exchange[t - 1],
-                                                             self.supply,
-                                                             self.prods[t],
-                                                             self.step_s
-                                                             )
-        self.q_opt = self.eco.firms.compute_optimal_quantities(self.targets[t + 1],
-                                                               self.prices[t],
-                                                               self.eco
-                                                               )
-
-        # (3) Posting demands
-        self.q_demand[t, 1:, 0] = self.q_opt[:, 0]
-        self.q_demand[t, 1:, 1:] = np.maximum(
-            self.q_opt[:, 1:] - (self.stocks[t] - np.diagonal(self.stocks[t]) * np.eye(self.n)),
-            0)
+        with self.phase('planning'):
+            self.supply = np.concatenate(
+                ([self.labour[t]], self.productivity(t) * self.prods[t] + self.stocks[t]))
+
+            self.targets[t + 1] = self.eco.firms.compute_targets(self.prices[t],
+                                                                 self.lda * self.q_demand[t - 1] +
+                                                                 (1 - self.lda) * self.q_exchange[t - 1],
+                                                                 self.supply,
+                                                                 self.prods[t],
+                                                                 self.step_s,
+                                                                 self.eco
+                                                                 )
+            self.q_opt = self.eco.firms.compute_optimal_quantities(self.targets[t + 1],
+                                                                   self.prices[t],
+                                                                   self.eco
+                                                                   )
+
+            # (3) Posting demands
+            self.q_demand[t, self.n:] = np.maximum(self.q_opt - self.input_stocks(t), 0)
 
     def exchanges_and_updates(self, t):
         """
@@ -202,51 +422,58 @@ class Dynamics(object):
         """
 
         # (1) Hiring and Wage payment
-        self.q_exchange[t, 1:, 0] = self.q_demand[t, 1:, 0] * np.minimum(1, self.labour[t] / np.sum(
-            self.q_demand[t, 1:, 0]))
+        with self.phase('hiring'):
+            self.q_exchange[t, self.labour_idx] = self.q_demand[t, self.labour_idx] * np.minimum(
+                1, self.labour[t] / np.sum(self.q_demand[t, self.labour_idx]))
 
-        self.budget = self.savings + np.sum(self.q_exchange[t, 1:, 0]) # Why no p0
+            # Wages are shared among households in proportion of their labour offers
+            self.budget = self.savings + self.labour_offers / self.labour[t] * \
+                np.sum(self.q_exchange[t, self.labour_idx])
 
-        self.q_demand[t, 0, 1:] = self.q_demand[t, 0, 1:] * (self.nu + (1 - self.nu) *
-                                                             np.minimum(1, self.budget /
-                                                                        (self.savings + self.labour[t])))
+            self.cons_targets = self.cons_targets * np.expand_dims(self.nu + (1 - self.nu) *
+                                                                   np.minimum(1, self.budget /
+                                                                              (self.savings + self.labour_offers)), -1)
+            self.q_demand[t, :self.n] = self.aggregate_households(self.cons_targets)
 
         # (2) Trades
-        self.demand = np.sum(self.q_demand[t], axis=0)
+        with self.phase('trades'):
+            self.demand = self.eco.column_sums(self.q_demand[t])
+            fulfilled = np.minimum(self.supply[1:] / self.demand[1:], 1)
 
-        self.q_exchange[t, :, 1:] = np.matmul(self.q_demand[t, :, 1:],
-                                              np.diag(np.minimum(self.supply[1:] / self.demand[1:], 1))
-                                              )
+            self.q_exchange[t, self.goods_idx] = self.q_demand[t, self.goods_idx] * fulfilled[self.goods_cols]
 
-        self.q_exchange[t, 0, 1:] = self.q_exchange[t, 0, 1:] * np.minimum(1, self.eco.house.f * self.budget / (
-            np.dot(self.q_exchange[t, 0, 1:], self.prices[t])))
+            consumption = self.cons_targets * fulfilled
+            consumption = consumption * np.expand_dims(np.minimum(1, self.eco.house.f * self.budget / (
+                np.dot(consumption, self.prices[t]))), -1)
+            self.q_exchange[t, :self.n] = self.aggregate_households(consumption)
 
-        self.savings = self.budget - np.dot(self.prices[t], self.q_exchange[t, 0, 1:])
+            self.savings = self.budget - np.dot(consumption, self.prices[t])
+            self.utilities[t] = self.eco.house.utility(consumption, self.labour_offers / self.labour[t] *
+                                                       np.sum(self.q_exchange[t, self.labour_idx]))
+            self.budgets[t] = self.budget
 
-        self.q_prod[:, 0] = self.q_exchange[t, 1:, 0]
-        self.q_prod[:, 1:] = self.q_exchange[t, 1:, 1:] + np.minimum(
-            self.stocks[t] - np.diag(self.stocks[t]) * np.eye(self.n), self.q_opt[:, 1:])
+            self.q_prod = self.q_exchange[t, self.n:] + np.minimum(self.input_stocks(t), self.q_opt)
 
-        self.tradereal = np.sum(self.q_exchange[t], axis=0)
-
-        self.gains = self.prices[t] * self.tradereal[1:]
-        self.losses = np.matmul(self.q_exchange[t, 1:, :], np.concatenate(([1], self.prices[t])))
+            self.gains, self.losses, self.tradereal = self.eco.firms.compute_gains_losses(self.prices[t],
+                                                                                         self.q_exchange[t],
+                                                                                         self.eco)
 
         # (3) Prices and Wage updates
         #print('####### Step '+str(t)+' #######')
         #print("SUPPLY", "NaN: ", np.isnan(self.supply).sum(), "inf: ", np.isinf(self.supply).sum())
         #print("DEMAND", "NaN: ", np.isnan(self.demand).sum(), "inf: ", np.isinf(self.demand).sum())
-        self.wages[t + 1] = self.eco.firms.update_wages(self.supply[0] - self.demand[0],
-                                                        self.supply[0] + self.demand[0],
-                                                        self.step_s)
-        #print("WAGES", "NaN: ", np.isnan(self.wages[t + 1]).sum(), "inf: ", np.isinf(self.wages[t + 1]).sum())
-        self.prices[t + 1] = self.eco.firms.update_prices(self.prices[t],
-                                                          self.gains - self.losses,
-                                                          self.supply - self.demand,
-                                                          self.gains + self.losses,
-                                                          self.supply + self.demand,
-                                                          self.step_s
-                                                          )
+        with self.phase('prices_wages'):
+            self.wages[t + 1] = self.eco.firms.update_wages(self.supply[0] - self.demand[0],
+                                                            self.supply[0] + self.demand[0],
+                                                            self.step_s)
+            #print("WAGES", "NaN: ", np.isnan(self.wages[t + 1]).sum(), "inf: ", np.isinf(self.wages[t + 1]).sum())
+            self.prices[t + 1] = self.eco.firms.update_prices(self.prices[t],
+                                                              self.gains - self.losses,
+                                                              self.supply - self.demand,
+                                                              self.gains + self.losses,
+                                                              self.supply + self.demand,
+                                                              self.step_s
+                                                              )
         #print("PRICES", "NaN: ", np.isnan(self.prices[t + 1]).sum(), "inf: ", np.isinf(self.prices[t + 1]).sum())
 
     def production(self, t):
@@ -259,33 +486,50 @@ class Dynamics(object):
         """
 
         # (1) Production starts
-        self.prods[t + 1] = self.eco.production_function(self.q_prod)
+        with self.phase('production'):
+            self.prods[t + 1] = self.eco.production_function(self.q_prod)
 
-        self.q_used = (self.eco.q == 0) * np.matmul(np.diag(np.nanmin(np.divide(self.q_prod, self.eco.j_a), axis=1)),
-                                                    self.eco.j_a) + (self.eco.q != 0) * self.q_prod
+            if self.eco.q == 0:
+                self.q_used = self.eco.leontief_ratios(self.q_prod)[self.eco.edge_rows] * self.eco.edge_j
+            else:
+                self.q_used = self.q_prod
 
         # (2) Inventory update
-        self.stocks[t + 1] = (self.eco.q == 0) * (self.q_prod[:, 1:] - self.q_used[:, 1:])
-
-        np.fill_diagonal(self.stocks[t + 1], self.supply[1:] - self.tradereal[1:])
-
-        self.stocks[t + 1] = np.matmul(self.stocks[t + 1], np.diag(np.exp(- self.eco.firms.sigma * self.step_s)))
+        with self.phase('inventory'):
+            decay = np.exp(- self.eco.firms.sigma * self.step_s)
+            self.stocks[t + 1] = (self.supply[1:] - self.tradereal[1:]) * decay
+            self.edge_stocks[t + 1] = (self.q_prod[self.stock_edges] - self.q_used[self.stock_edges]) * \
+                decay[self.stock_cols]
 
         # (3) Price rescaling
-        self.prices[t + 1] = self.prices[t + 1] / self.wages[t + 1]
-        self.budget = self.budget / self.wages[t + 1]
-        self.savings = (1 + self.eco.house.r) * np.maximum(self.savings, 0) / self.wages[t + 1]
-        # Clipping to avoid negative almost zero values
-
-        # The household performs its optimization to set its consumption target and its labour supply for the next
-        # period
-        self.q_demand[t + 1, 0, 1:], self.labour[t + 1] = \
-            self.eco.house.compute_demand_cons_labour_supply(self.savings,
-                                                             self.prices[t + 1],
-                                                             self.supply[0],
-                                                             self.demand[0],
-                                                             self.step_s
-                                                             )
+        with self.phase('household'):
+            self.prices[t + 1] = self.prices[t + 1] / self.wages[t + 1]
+            self.budget = self.budget / self.wages[t + 1]
+            self.savings = (1 + self.eco.house.r) * np.maximum(self.savings, 0) / self.wages[t + 1]
+            # Clipping to avoid negative almost zero values
+
+            # The household performs its optimization to set its consumption target and its labour supply for the next
+            # period
+            self.cons_targets, self.labour_offers = \
+                self.eco.house.compute_demand_cons_labour_supply(self.savings,
+                                                                 self.prices[t + 1],
+                                                                 self.supply[0],
+                                                                 self.demand[0],
+                                                                 self.step_s,
+                                                                 self.shocks('theta', t + 1, self.n)
+                                                                 )
+            self.labour_offers = self.shock_labour(t + 1, self.labour_offers)
+            self.q_demand[t + 1, :self.n] = self.aggregate_households(self.cons_targets)
+            self.labour[t + 1] = np.sum(self.labour_offers)
+
+    @staticmethod
+    def aggregate_households(x):
+        """
+        Aggregates consumption quantities over households.
+        :param x: vector of size n for a representative household or (H, n) matrix for a population of households,
+        :return: Aggregate vector of size n.
+        """
+        return np.sum(np.atleast_2d(x), axis=0)
 
     def discrete_dynamics(self):
         """
@@ -299,57 +543,333 @@ class Dynamics(object):
         self.savings = self.B0 / self.w0
 
         self.prods[1] = self.g0
-        self.stocks[1] = self.s0
+        if np.ndim(self.s0) == 2:
+            self.stocks[1] = np.diagonal(self.s0)
+            self.edge_stocks[1] = self.s0[self.eco.edge_rows[self.stock_edges], self.stock_cols]
+            # Inputs other than labour and firms' own goods, whose inventories are only stored in the Leontief regime
+            inputs = (self.eco.edge_cols > 0) & (self.eco.edge_cols - 1 != self.eco.edge_rows)
+            self.initial_input_stocks = np.zeros(self.m)
+            self.initial_input_stocks[inputs] = self.s0[self.eco.edge_rows[inputs], self.eco.edge_cols[inputs] - 1]
+        else:
+            self.stocks[1] = self.s0
         self.prices[1] = self.p0 / self.w0
         self.prices_non_res[1] = self.p0
-        self.q_demand[1, 0, 1:], self.labour[1] = \
+        self.cons_targets, self.labour_offers = \
             self.eco.house.compute_demand_cons_labour_supply(self.savings,
                                                              self.prices[1],
                                                              1,
                                                              1,
-                                                             self.step_s
+                                                             self.step_s,
+                                                             self.shocks('theta', 1, self.n)
                                                              )
+        self.labour_offers = self.shock_labour(1, self.labour_offers)
+        self.q_demand[1, :self.n] = self.aggregate_households(self.cons_targets)
+        self.labour[1] = np.sum(self.labour_offers)
+        self.accumulate(1)
 
         # Planning period with provided initial target t1.
-        self.supply = np.concatenate([[self.labour[1]], self.eco.firms.z * self.g0 + np.diagonal(self.s0)])
-        self.targets[2] = self.t1
-        self.q_opt = self.eco.firms.compute_optimal_quantities(self.targets[2],
-                                                               self.prices[1],
-                                                               self.eco
-                                                               )
-
-        self.q_demand[1, 1:, 0] = self.q_opt[:, 0]
-        self.q_demand[1, 1:, 1:] = np.maximum(
-            self.q_opt[:, 1:] - (self.stocks[1] - np.diagonal(self.stocks[1]) * np.eye(self.n)),
-            0)
+        with self.phase('planning'):
+            self.supply = np.concatenate([[self.labour[1]], self.productivity(1) * self.g0 + self.stocks[1]])
+            self.targets[2] = self.t1
+            self.q_opt = self.eco.firms.compute_optimal_quantities(self.targets[2],
+                                                                   self.prices[1],
+                                                                   self.eco
+                                                                   )
+
+            self.q_demand[1, self.n:] = np.maximum(self.q_opt - self.input_stocks(1), 0)
 
         # Carrying on with Exchanges & Trades and Production with every needed quantities known.
         self.exchanges_and_updates(1)
         self.production(1)
+        self.aggregate(1)
+        self.record(1)
         # End of first time-step
-        t = 2
-        while t < int((self.t_max + 1) / self.step_s - 1):
+        self.current_t = 2
+        self.run_steps()
+
+        # The current information stocked in the dynamics class are in accordance with the provided initial conditions.
+        self.run_with_current_ic = True
+
+    def run_steps(self):
+        """
+        Carries on the dynamics from the current time-step until the end of the allocated time-series.
+        :return: side-effect
+        """
+        if self.adaptive_tol:
+            self.run_adaptive_steps()
+            return
+        t = self.current_t
+        while t < len(self.prices) - 1:
+            self.accumulate(t)
             self.planning(t)
             self.exchanges_and_updates(t)
             self.production(t)
+            self.aggregate(t)
+            self.record(t)
             t += 1
+        self.current_t = t
 
-        # The current information stocked in the dynamics class are in accordance with the provided initial conditions.
+    def run_adaptive_steps(self):
+        """
+        Carries on the dynamics from the current time-step until time t_max with a step size controlled by the largest
+        relative rate of change of prices, wage and production targets over one step, which all scale with the step
+        size. A step whose change exceeds the tolerance is rejected and retried with a smaller step size. Steps that
+        exceed the tolerance at the lower bound of the step size are accepted and counted in floor_steps. Time-series
+        are extended as needed and truncated at the last time-step.
+        :return: side-effect
+        """
+        step_min, step_max = self.step_bounds
+        t = self.current_t
+        while self.times[t] < self.t_max:
+            if t >= len(self.prices) - 1:
+                self.extend_time_series(max(t // 2, 1))
+            self.current_t = t
+            checkpoint = self.get_checkpoint()
+            self.planning(t)
+            self.exchanges_and_updates(t)
+            self.production(t)
+
+            error = np.nan_to_num(self.relative_change(t) / self.adaptive_tol, nan=np.inf)
+            factor = 0.9 / error if error > 0 else 2
+            if error > 1 and self.step_s > step_min:
+                self.set_checkpoint(checkpoint)
+                self.step_s = max(step_min, self.step_s * max(0.2, factor))
+            else:
+                if error > 1:
+                    self.floor_steps += 1
+                self.accumulate(t)
+                self.aggregate(t)
+                self.record(t)
+                self.times[t + 1] = self.times[t] + self.step_s
+                self.step_s = min(step_max, max(step_min, self.step_s * min(2, factor)))
+                t += 1
+        self.current_t = t
+        for name in self.time_series:
+            series = getattr(self, name)
+            if isinstance(series, RingSeries):
+                series.truncate(t + 1)
+            else:
+                setattr(self, name, series[:t + 1])
+
+    def accumulate(self, t):
+        """
+        Updates the accumulators with the state at the beginning of time-step t, before it is carried out, so that
+        the state at the last time-step of a run is left out as in norm_prices_prods_stocks.
+        :param t: time-step,
+        :return: side-effect
+        """
+        for accumulator in self.accumulators:
+            accumulator.update(self, t)
+
+    def aggregate(self, t):
+        """
+        Computes the macroeconomic aggregates of time-step t, once it is carried out, from the quantities of the step:
+        nominal output and real output at equilibrium prices, price index of the household(s) (geometric mean of
+        prices relative to equilibrium weighted by preferences theta), labour-market tension (labour supply over labour
+        demand), inventories held at the beginning of the step and aggregate profits.
+        :param t: time-step,
+        :return: side-effect
+        """
+        output = self.productivity(t) * self.prods[t]
+        weights = np.sum(np.reshape(self.eco.house.theta, (-1, self.n)), axis=0)
+        with np.errstate(all='ignore'):
+            self.aggregates[t] = (np.dot(self.prices[t], output),
+                                  np.dot(self.eco.p_eq, output),
+                                  np.exp(np.dot(weights, np.log(self.prices[t] / self.eco.p_eq)) / np.sum(weights)),
+                                  self.supply[0] / self.demand[0],
+                                  np.sum(self.stocks[t]) + np.sum(self.input_stocks(t)),
+                                  np.sum(self.gains - self.losses))
+
+    def get_aggregates(self):
+        """
+        :return: A data-frame of the macroeconomic aggregates of the time-steps carried out, indexed by time.
+        """
+        import pandas as pd
+        return pd.DataFrame(self.aggregates[1:-1], index=self.times[1:-1], columns=self.aggregate_columns)
+
+    def record(self, t):
+        """
+        Copies the recorded time-series at time-step t, once it is carried out, if the dynamics is given a recording
+        and t is a recorded time-step. As for the last time-step of full time-series, time-steps that are not carried
+        out are not recorded.
+        :param t: time-step,
+        :return: side-effect
+        """
+        if self.recording and self.recording.recorded(t):
+            self.record_steps.append(t)
+            for name, columns in self.record_columns.items():
+                row = getattr(self, name)[t]
+                self.records[name].append(np.array(row if columns is None else row[columns]))
+
+    def get_records(self):
+        """
+        :return: Dictionary of the recorded time-series by name, with their time-steps ('steps') and times ('times').
+        """
+        if not self.recording:
+            raise Exception("The dynamics has no recording, its time-series are stored in full.")
+        steps = np.array(self.record_steps, dtype=int)
+        records = {'steps': steps, 'times': self.times[steps]}
+        for name, rows in self.records.items():
+            shape = (len(rows),) + np.shape(getattr(self, name)[1])
+            if self.record_columns[name] is not None:
+                shape = shape[:-1] + (len(self.record_columns[name]),)
+            records[name] = np.array(rows).reshape(shape)
+        return records
+
+    def relative_change(self, t):
+        """
+        Relative changes of prices and wage, and relative gaps between production targets and current productions,
+        which are all proportional to the step size. Productions themselves are levels set by the inputs bought during
+        the step and are not controlled.
+        :param t: time-step,
+        :return: Largest relative change from time-step t to t+1.
+        """
+        old = np.concatenate((self.prices[t], self.prods[t], [1]))
+        new = np.concatenate((self.prices[t + 1], self.targets[t + 1], [self.wages[t + 1]]))
+        with np.errstate(all='ignore'):
+            change = np.abs(np.log(new / old))
+        # Runs that already diverged and firms shut down do not constrain the step size
+        if not np.isfinite(old).all():
+            return 0
+        change[(old == 0) & (new == 0)] = 0
+        return np.max(change)
+
+    def continue_dynamics(self, extra_steps=None):
+        """
+        Extends a run (or a run restored from a checkpoint) by a given amount of time without recomputing it from
+        the first time-step.
+        :param extra_steps: additional simulation time, default is to only complete the allocated time-series,
+        :return: Side-effect
+        """
+        if self.current_t is None:
+            raise Exception("No run to continue, run the dynamics or restore a checkpoint first.")
+        if extra_steps:
+            if not self.adaptive_tol:
+                self.extend_time_series(int(round(extra_steps / self.step_s)))
+            self.t_max = self.t_max + extra_steps
+        self.run_steps()
+
+    def extend_time_series(self, k):
+        """
+        Appends k empty time-steps to every time-series.
+        :param k: number of time-steps to add,
+        :return: side-effect
+        """
+        for name in self.time_series:
+            series = getattr(self, name)
+            if isinstance(series, RingSeries):
+                series.extend(k)
+            else:
+                setattr(self, name, np.concatenate((series, np.zeros((k,) + series.shape[1:]))))
+        self.times[-k:] = self.times[-k - 1] + self.step_s * np.arange(1, k + 1)
+
+    # Checkpointing methods
+
+    def get_checkpoint(self):
+        """
+        Gathers the minimal state needed to carry on the dynamics from the current time-step.
+        :return: Dictionary of arrays.
+        """
+        t = self.current_t
+        return {'t': np.array(t),
+                'time': np.array(self.times[t]),
+                'step_s': np.array(self.step_s),
+                'prices': self.prices[t],
+                'wages': self.wages[t],
+                'prods': self.prods[t],
+                'targets': self.targets[t],
+                'stocks': self.stocks[t],
+                'edge_stocks': self.edge_stocks[t],
+                'q_demand': self.q_demand[t - 1],
+                'q_exchange': self.q_exchange[t - 1],
+                'cons_targets': np.array(self.cons_targets),
+                'labour_offers': np.array(self.labour_offers),
+                'savings': np.array(self.savings)}
+
+    def set_checkpoint(self, checkpoint):
+        """
+        Restores the state of the dynamics from a checkpoint. Time-series are extended if the checkpoint lies beyond
+        their current length, and only the state at the checkpoint's time-step is written.
+        :param checkpoint: dictionary of arrays as given by get_checkpoint,
+        :return: side-effect
+        """
+        if self.adaptive_tol:
+            self.step_s = float(checkpoint['step_s'])
+        elif float(checkpoint['step_s']) != self.step_s:
+            raise ValueError('Checkpoint was taken with step size %g' % float(checkpoint['step_s']))
+        t = int(checkpoint['t'])
+        if t > len(self.prices) - 1:
+            self.extend_time_series(t + 1 - len(self.prices))
+            if not self.adaptive_tol:
+                self.t_max = len(self.prices) * self.step_s - 1
+        if 'time' in checkpoint:
+            self.times[t] = checkpoint['time']
+        self.prices[t] = checkpoint['prices']
+        self.wages[t] = checkpoint['wages']
+        self.prods[t] = checkpoint['prods']
+        self.targets[t] = checkpoint['targets']
+        self.stocks[t] = checkpoint['stocks']
+        self.edge_stocks[t] = checkpoint['edge_stocks']
+        self.q_demand[t - 1] = checkpoint['q_demand']
+        self.q_exchange[t - 1] = checkpoint['q_exchange']
+        self.cons_targets = checkpoint['cons_targets']
+        self.labour_offers = checkpoint['labour_offers']
+        self.savings = checkpoint['savings'][()]
+        self.q_demand[t, :self.n] = self.aggregate_households(self.cons_targets)
+        self.labour[t] = np.sum(self.labour_offers)
+        self.current_t = t
         self.run_with_current_ic = True
 
+    def save_checkpoint(self, name):
+        """
+        Saves the current checkpoint in npz format.
+        :param name: name of file,
+        """
+        np.savez(name, **self.get_checkpoint())
+
+    def load_checkpoint(self, name):
+        """
+        Restores the state of the dynamics from a checkpoint saved in npz format.
+        :param name: name of file,
+        :return: side-effect
+        """
+        with np.load(name) as checkpoint:
+            self.set_checkpoint(dict(checkpoint))
+
     # Classification methods
 
-    def norm_prices_prods_stocks(self):
+    def norm_prices_prods_stocks(self, step=None):
         """
+        Runs with adaptive time-stepping are first resampled on a uniform time grid so that the classifiers operate
+        in time rather than in time-steps.
+        :param step: spacing of the uniform time grid for adaptive runs, default is the size of the first time step,
         :return: A data-frame of prices, productions and diagonal stocks across time.
         """
+        import pandas as pd
         dfp = pd.DataFrame(self.prices[1:-1] - self.eco.p_eq, columns=['p' + str(i) for i in range(self.n)])
         dfg = pd.DataFrame(self.prods[1:-1] - self.eco.g_eq, columns=['g' + str(i) for i in range(self.n)])
-        dfs = pd.DataFrame([np.diagonal(s) for s in self.stocks[1:-1]], columns=['s' + str(i) for i in range(self.n)])
+        dfs = pd.DataFrame(self.stocks[1:-1], columns=['s' + str(i) for i in range(self.n)])
         df = pd.concat([dfp, dfg, dfs], axis=1)
+        if self.adaptive_tol:
+            df = pd.DataFrame(self.resample(df.to_numpy(), self.times[1:-1], step if step else self.step_size)[1],
+                              columns=df.columns)
         df = df.apply(lambda x: np.linalg.norm(x), axis=1)
         return df
 
+    @staticmethod
+    def resample(data, times, step):
+        """
+        Linearly interpolates a time-series sampled at non-uniform times on a uniform time grid.
+        :param data: array whose first axis is time,
+        :param times: increasing times of the samples,
+        :param step: spacing of the uniform time grid,
+        :return: Uniform time grid and resampled data.
+        """
+        grid = np.arange(times[0], times[-1], step)
+        idx = np.clip(np.searchsorted(times, grid, side='right') - 1, 0, len(times) - 2)
+        weights = ((grid - times[idx]) / (times[idx + 1] - times[idx])).reshape((-1,) + (1,) * (np.ndim(data) - 1))
+        return grid, (1 - weights) * data[idx] + weights * data[idx + 1]
+
     @staticmethod
     def rolling_diff(data, step_back):
         """
@@ -357,6 +877,7 @@ class Dynamics(object):
         :param step_back: window on which to perform the rolling diff.
         :return: Rolling min-max diff of data on a given window.
         """
+        import pandas as pd
         t_diff = []
         for t in range(1, len(data) - step_back + 1):
             t_diff.append(np.amax(data[- t - step_back:- t]) - np.amin(data[- t - step_back:- t]))
@@ -373,6 +894,8 @@ class Dynamics(object):
         :param data: data-frame on which to perform the Fisher test.
         :return: p-value computed for the Fisher test.
         """
+        from scipy.signal import periodogram
+        from scipy.special.cython_special import binom
         freq, dft = periodogram(data, fs=1)
         q = int((len(data) - 1) / 2)
         stat = max(dft) / np.sum(dft)
@@ -411,6 +934,7 @@ class Dynamics(object):
         if np.isnan(data).any():
             return True
         else:
+            import pandas as pd
             t_diff = []
             for t in range(1, len(data) - 10 + 1):
                 t_diff.append(np.amax(data[- t - 10:- t]) - np.amin(data[- t - 10:- t]))
@@ -429,50 +953,58 @@ class Dynamics(object):
     # Reconstruction methods
 
     @staticmethod
-    @jit
-    def compute_gains_losses_supplies_demand(e, q_demand, q_exchange, prices, prods, stocks, labour):
+    def compute_gains_losses_supplies_demand(e, q_demand, q_exchange, prices, prods, stocks, labour,
+                                             productivities=None):
         """
         Reconstruction method to compute gains, losses, supplies and demands across time.
         :param e: economy class,
-        :param q_demand: time-series of demand matrices,
-        :param q_exchange: time-series of exchange matrices,
+        :param q_demand: time-series of edge-lists of demanded quantities,
+        :param q_exchange: time-series of edge-lists of exchanged quantities,
         :param prices: time-series of wage-rescaled prices,
         :param prods: time-series of production levels
-        :param stocks: time-series of stocks,
-        :param labour: time-series of labour supply.
+        :param stocks: time-series of firms' inventories of their own goods,
+        :param labour: time-series of labour supply,
+        :param productivities: time-series of the productivity factors of noisy runs (see productivities), default is
+        the productivity factors of the economy.
         :return: Time-series of computed gains, losses, supplies and demands.
         """
-        demands = np.sum(q_demand, axis=1)
-        gains = np.zeros((len(prices), e.n))
-        losses = np.zeros((len(prices), e.n))
-        supplies = np.zeros((len(prices), e.n + 1))
-        for i in range(len(prices)):
-            gains[i] = prices[i] * np.sum(q_exchange[i, :, 1:], axis=0)
-            losses[i] = np.matmul(q_exchange[i, 1:, :], np.concatenate(([1], prices[i])))
-            supplies[i] = np.concatenate(([labour[i]], e.firms.z * prods[i] + np.diag(stocks[i])))
+        demands = e.column_sums(q_demand)
+        gains, losses, _ = e.firms.compute_gains_losses(prices, q_exchange, e)
+        supplies = np.hstack((labour[:, None], (e.firms.z if productivities is None else productivities) * prods
+                              + stocks))
         return gains, losses, supplies, demands
 
+    def utility_budget(self):
+        """
+        For a representative household, utility and budget are reconstructed from the exchanged quantities. For a
+        population of households, utilities and budgets recorded during the dynamics are summed over households.
+        :return: Time-series for utility and budget.
+        """
+        if np.ndim(self.eco.house.theta) == 2:
+            return np.sum(self.utilities, axis=1), np.sum(self.budgets, axis=1)
+        return self.compute_utility_budget(self.eco, self.q_exchange, self.prices, self.wages, self.B0)
+
     @staticmethod
-    @jit
-    def compute_utility_budget(e, q_exchange, prices, rescaling_factors, t_max, step_s, initial_savings):
+    def compute_utility_budget(e, q_exchange, prices, rescaling_factors, initial_savings):
         """
         Reconstruction method to compute utility and non-rescaled budget across time.
         :param e: economy class,
-        :param q_exchange: time-series of exchange matrices,
+        :param q_exchange: time-series of edge-lists of exchanged quantities,
         :param prices: time-series of prices,
         :param rescaling_factors: time-series of wages used to rescale prices,
-        :param t_max: maximum number of time-steps,
-        :param step_s: size of one time step,
         :param initial_savings: initial savings
         :return: Time-series for utility and non-rescaled budgets.
         """
-        utility = np.zeros(int((t_max + 1) / step_s))
-        budget = np.zeros(int((t_max + 1) / step_s))
+        if np.ndim(e.house.theta) == 2:
+            raise ValueError('Consumptions of a population of households are not stored, use Dynamics.utility_budget.')
+        t_end = len(q_exchange) - 1
+        utility = np.zeros(len(q_exchange))
+        budget = np.zeros(len(q_exchange))
         budget[0] = initial_savings
-        for i in range(1, int((t_max + 1) / step_s) - 1):
-            utility[i] = np.power(rescaling_factors[i + 1], e.house.omega_p / e.firms.omega) * \
-                         np.dot(e.house.theta, q_exchange[i, 0, 1:]) - \
-                         np.power(np.sum(q_exchange[i, 1:, 0]) / e.house.l_0, 1 + e.house.phi) * e.house.gamma / (
-                                 1 + e.house.phi)
-            budget[i] = budget[i - 1] - np.dot(prices[i - 1], q_exchange[i - 1, 0, 1:]) + np.sum(q_exchange[i, 1:, 0])
+        wage_income = np.sum(q_exchange[1:t_end, e.n + np.nonzero(e.edge_cols == 0)[0]], axis=1)
+        utility[1:t_end] = np.power(rescaling_factors[2:t_end + 1], e.house.omega_p / e.firms.omega) * \
+            np.dot(q_exchange[1:t_end, :e.n], e.house.theta) - \
+            np.power(wage_income / e.house.l_0, 1 + e.house.phi) * e.house.gamma / (1 + e.house.phi)
+        budget[1:t_end] = initial_savings + np.cumsum(wage_income - np.einsum('ti,ti->t', prices[:t_end - 1],
+                                                                              q_exchange[:t_end - 1, :e.n]))
         return utility, budget
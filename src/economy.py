@@ -22,31 +22,55 @@ This module declares the Economy class which encapsulates everything static in t
 This class has the network attributes (both input-output and substitution) along with subsequent quantities
 (equilibrium etc). It also inherits firms and households attributes.
 """
+import json
+import os
 import warnings
 
 import numpy as np
-import pandas as pd
 from numpy.linalg import lstsq
-from scipy.optimize import leastsq
 
 from firms import Firms
-from household import Household
+from household import Household, Households
 from network import create_net
 
 warnings.simplefilter("ignore")
 
 class Economy:
 
-    def __init__(self, n, d, netstring, directed, j0, a0, q, b):
+    # Parameters of the firms and household classes, in the order of their constructors
+    firms_params = ('z', 'sigma', 'alpha', 'alpha_p', 'beta', 'beta_p', 'omega')
+    house_params = ('l_0', 'theta', 'gamma', 'phi', 'omega_p', 'f', 'r')
+
+    # Equilibrium quantities, per-edge tables and dense derived networks saved by save_eco
+    eq_quantities = ('p_eq', 'g_eq', 'mu_eq', 'labour_eq', 'cons_eq', 'b_eq', 'utility_eq')
+    edge_tables = ('edge_rows', 'edge_cols', 'edge_starts', 'nonempty_rows', 'edge_j', 'edge_lamb', 'edge_a', 'edge_w',
+                   'h', 'h_prod')
+    dense_networks = ('j_a', 'a_a', 'lamb_a', 'm_cal', 'zeros_j_a')
+
+    def __init__(self, n, d, netstring, directed, j0, a0, q, b, j=None, a=None):
+        """
+        :param n: number of firms,
+        :param d: connectivity of the generated input-output network,
+        :param netstring: type of the generated input-output network,
+        :param directed: whether or not the generated input-output network is directed,
+        :param j0: labour inputs of the firms,
+        :param a0: labour substitution weights of the firms,
+        :param q: CES parameter,
+        :param b: return to scale parameter,
+        :param j: input-output network to use instead of a generated one,
+        :param a: substitution network to use instead of a random one.
+        """
 
         # Network initialization
         self.n = n
-        self.j = create_net(netstring, directed, n, d)
+        self.j = j if j is not None else create_net(netstring, directed, n, d)
         self.j0 = j0
         self.j_a = None
         self.a0 = a0
-        a = np.multiply(np.random.uniform(0, 1, (n, n)), self.j)
-        self.a = np.array([(1 - a0[i]) * a[i] / np.sum(a[i]) for i in range(n)])
+        if a is None:
+            a = np.multiply(np.random.uniform(0, 1, (n, n)), self.j)
+            a = np.array([(1 - a0[i]) * a[i] / np.sum(a[i]) for i in range(n)])
+        self.a = a
         self.a_a = None
         self.q = q
         self.zeta = 1 / (q + 1)
@@ -58,10 +82,26 @@ class Economy:
         self.j_a = None
         self.lamb_a = None
         self.m_cal = None
+        self.m_cal_inv = None  # Inverse of m_cal, kept up to date by edge mutations once computed
+        # Economy whose networks are private copies, mutated in place by edge mutations. Copies of the economy (e.g. by
+        # copy.copy) share its networks until their own first mutation
+        self.networks_owner = None
         self.v = None
         self.kappa = None
         self.zeros_j_a = None
 
+        # Per-edge tables restricted to the nonzero entries of the augmented network
+        self.edge_rows = None
+        self.edge_cols = None
+        self.edge_starts = None
+        self.nonempty_rows = None
+        self.edge_j = None
+        self.edge_lamb = None
+        self.edge_a = None
+        self.edge_w = None
+        self.h = None
+        self.h_prod = None
+
         # Firms and household sub-classes
         self.firms = None
         self.house = None
@@ -89,6 +129,22 @@ class Economy:
         """
         self.house = Household(l_0, theta, gamma, phi, omega_p, f, r)
 
+    def init_households(self, l_0, theta, gamma, phi, omega_p=None, f=None, r=None):
+        """
+        Initialize a population of heterogeneous households as instance of economy class. Refer to households class.
+        :param l_0: baseline work offers,
+        :param theta: (H, n) matrix of preferency factors,
+        :param gamma: aversions to work,
+        :param phi: Frisch indices,
+        :param omega_p: confidence parameters,
+        :param f: fractions of budget to save,
+        :param r: savings growth rates.
+        :return: Initializes households class with given parameters.
+        """
+        if np.atleast_2d(theta).shape[1] != self.n:
+            raise ValueError('Preferences must be of size (H, %d)' % self.n)
+        self.house = Households(l_0, theta, gamma, phi, omega_p, f, r)
+
     def init_firms(self, z, sigma, alpha, alpha_p, beta, beta_p, omega):
         """
         Initialize a firms object as instance of economy class. Refer to firms class.
@@ -148,18 +204,22 @@ class Economy:
 
     def update_house_labour(self, labour):
         self.house.update_labour(labour)
+        self.set_quantities()
         self.compute_eq()
 
     def update_house_theta(self, theta):
         self.house.update_theta(theta)
+        self.set_quantities()
         self.compute_eq()
 
     def update_house_gamma(self, gamma):
         self.house.update_gamma(gamma)
+        self.set_quantities()
         self.compute_eq()
 
     def update_house_phi(self, phi):
         self.house.update_phi(phi)
+        self.set_quantities()
         self.compute_eq()
 
     def update_house_w_p(self, omega_p):
@@ -198,6 +258,151 @@ class Economy:
         self.set_quantities()
         self.compute_eq()
 
+    # Edge-level mutations of the networks
+
+    def set_edge(self, i, k, j_ik, a_ik, renormalize=True):
+        """
+        Sets the input-output and substitution weights of the edge along which firm i buys the good of firm k. Every
+        mutation only modifies row i of the networks, hence it is a rank-one update of the economy matrix: its inverse
+        is updated with the Sherman-Morrison formula and, with constant return to scale, the equilibrium is recomputed
+        from it in O(n^2) operations. The inverse is computed once, on the first mutation, and accumulates rounding
+        errors over many mutations; set_quantities and compute_eq start afresh. The networks are copied on the first
+        mutation of an economy, so that arrays given by the caller and copies of the economy are left unchanged.
+        Dynamics built on the economy must be updated with update_eco.
+        :param i: index of the buying firm,
+        :param k: index of the supplying firm,
+        :param j_ik: input-output weight of the edge, 0 to remove it,
+        :param a_ik: substitution weight of the edge,
+        :param renormalize: whether or not to rescale the substitution weights of firm i so that they keep summing to
+        1 - a0[i], default True.
+        :return: side effect.
+        """
+        j_row = np.array(self.j[i], dtype=float)
+        a_row = np.array(self.a[i], dtype=float)
+        j_row[k] = j_ik
+        a_row[k] = a_ik if j_ik != 0 else 0
+        if renormalize and np.sum(a_row) > 0:
+            a_row *= (1 - self.a0[i]) / np.sum(a_row)
+        self.set_row(i, j_row, a_row)
+
+    def add_edge(self, i, k, j_ik=1., a_ik=None, renormalize=True):
+        """
+        Adds a supplier to firm i, see set_edge.
+        :param i: index of the buying firm,
+        :param k: index of the new supplying firm,
+        :param j_ik: input-output weight of the edge, default 1,
+        :param a_ik: substitution weight of the edge, default is the average weight of the other suppliers of firm i,
+        :param renormalize: whether or not to rescale the substitution weights of firm i, default True.
+        :return: side effect.
+        """
+        if a_ik is None:
+            weights = self.a[i][self.j[i] != 0]
+            a_ik = np.mean(weights) if len(weights) else 1 - self.a0[i]
+        self.set_edge(i, k, j_ik, a_ik, renormalize)
+
+    def remove_edge(self, i, k, renormalize=True):
+        """
+        Removes a supplier of firm i, see set_edge.
+        :param i: index of the buying firm,
+        :param k: index of the removed supplying firm,
+        :param renormalize: whether or not to rescale the substitution weights of firm i, default True.
+        :return: side effect.
+        """
+        self.set_edge(i, k, 0, 0, renormalize)
+
+    def set_row(self, i, j_row, a_row):
+        """
+        Replaces the suppliers of firm i and updates the subsequent quantities and the equilibrium incrementally.
+        :param i: index of the firm,
+        :param j_row: input-output weights of its suppliers,
+        :param a_row: substitution weights of its suppliers,
+        :return: side effect.
+        """
+        if self.m_cal_inv is None:
+            self.m_cal_inv = np.linalg.inv(self.m_cal)
+        # Networks are copied before the first mutation of the economy, since they may be read-only (memory-mapped or
+        # attached from shared memory), given by the caller or shared with copies of the economy
+        elif self.networks_owner is not self:
+            self.m_cal_inv = np.array(self.m_cal_inv)
+        if self.networks_owner is not self:
+            for name in ('j', 'a', 'lamb', 'j_a', 'a_a', 'lamb_a', 'm_cal', 'zeros_j_a'):
+                setattr(self, name, np.array(getattr(self, name)))
+            self.networks_owner = self
+
+        self.j[i] = j_row
+        self.a[i] = a_row
+        self.j_a[i] = np.concatenate(([self.j0[i]], j_row))
+        self.a_a[i] = np.concatenate(([self.a0[i]], a_row))
+        if self.q == 0:
+            self.lamb_a[i] = self.j_a[i]
+            diagonal = self.firms.z[i]
+        elif self.q == np.inf:
+            self.lamb_a[i] = self.a_a[i]
+            diagonal = 1
+        else:
+            self.lamb_a[i] = np.power(self.a_a[i], self.q * self.zeta) * np.power(self.j_a[i], self.zeta)
+            diagonal = np.power(self.firms.z[i], self.zeta)
+        self.lamb[i] = self.lamb_a[i, 1:]
+        self.zeros_j_a[i] = self.j_a[i] != 0
+        row = - self.lamb[i]
+        row[i] += diagonal
+        d = row - self.m_cal[i]
+        self.m_cal[i] = row
+        self.set_edge_tables()
+
+        # Sherman-Morrison update of the inverse for m_cal + e_i d^T
+        col = self.m_cal_inv[:, i].copy()
+        denominator = 1 + np.dot(d, col)
+        if abs(denominator) < 1e-12:
+            self.m_cal_inv = None
+            self.compute_eq()
+            return
+        self.m_cal_inv -= np.outer(col, np.dot(d, self.m_cal_inv) / denominator)
+        if self.b == 1:
+            self.compute_eq_linear(lambda rhs, transpose: np.dot(self.m_cal_inv.T if transpose else self.m_cal_inv,
+                                                                 rhs))
+        else:
+            self.compute_eq()
+
+    def compute_eq_blocks(self, blocks=None, method='jacobi', tol=1e-12, max_iter=1000, workers=None):
+        """
+        Computes the competitive equilibrium with constant return to scale by solving the economy matrix block by
+        block along communities of the network, see the BlockSolver class.
+        :param blocks: list of arrays of firms partitioning the economy, default is its Louvain communities,
+        :param method: 'jacobi' (blocks solved in parallel) or 'gauss-seidel' (blocks solved in sequence),
+        :param tol: relative change of the solutions at which block iterations stop,
+        :param max_iter: maximum number of block iterations,
+        :param workers: number of threads solving the blocks, default is the number of processors,
+        :return: side effect.
+        """
+        if self.b != 1:
+            raise ValueError('Block equilibrium solves require constant return to scale (b = 1)')
+        from blocks import BlockSolver
+        solver = BlockSolver(self, blocks, workers)
+        self.compute_eq_linear(lambda rhs, transpose: solver.solve(rhs, transpose, method, tol, max_iter)[0])
+
+    def compute_eq_linear(self, solve):
+        """
+        Computes the competitive equilibrium with constant return to scale, given a solver of the economy matrix.
+        :param solve: function of a right-hand side and of whether or not to use the transpose of the economy matrix,
+        returning the solution of the corresponding linear system,
+        :return: side effect.
+        """
+        if self.q == np.inf:
+            v = solve(self.kappa, True)
+            log_p = solve(- np.log(self.firms.z) + self.h, False)
+            self.p_eq = np.exp(log_p)
+            self.g_eq = np.exp(- np.log(self.firms.z) - log_p + np.log(v))
+        elif self.q == 0:
+            self.p_eq = solve(self.v, False)
+            self.g_eq = solve(self.kappa / self.p_eq, True)
+        else:
+            u = solve(self.v, False)
+            self.p_eq = np.power(u, 1. / self.zeta)
+            w = solve(self.kappa / u, True)
+            self.g_eq = np.divide(w, np.power(self.firms.z, self.q * self.zeta) * np.power(u, self.q))
+        self.compute_eq_house()
+
     def set_quantities(self):
         """
         Sets redundant economy quantities as class instances.
@@ -226,12 +431,84 @@ class Economy:
                                       np.power(self.j_a, self.zeta))
             self.m_cal = np.diag(np.power(self.firms.z, self.zeta)) - self.lamb
             self.v = np.array(self.lamb_a[:, 0])
-        self.mu_eq = np.power(np.power(self.house.gamma, 1./self.house.phi) * np.sum(self.house.theta) *
+        self.mu_eq = np.power(np.power(self.house.gamma, 1./self.house.phi) * np.sum(self.house.theta, axis=-1) *
                               (1 - (1 - self.house.f) * (1 + self.house.r)) /
                               (self.house.f * np.power(self.house.l_0, 1 + 1./self.house.phi)),
                               self.house.phi / (1 + self.house.phi))
-        self.kappa = self.house.theta / self.mu_eq
+        # Consumption expenditures are aggregated over households when the consumer sector is heterogeneous
+        self.kappa = self.house.theta / self.mu_eq if np.ndim(self.mu_eq) == 0 else np.dot(1. / self.mu_eq,
+                                                                                          self.house.theta)
         self.zeros_j_a = self.j_a != 0
+        self.m_cal_inv = None
+        self.set_edge_tables()
+
+    def set_edge_tables(self):
+        """
+        Precomputes the per-edge tables used by the production and planning kernels. Edges are the entries of the
+        augmented network along which goods or labour can actually be used, so that kernels never touch the
+        structural zeros of the network.
+        :return: side effect
+        """
+        self.edge_rows, self.edge_cols = np.nonzero(self.zeros_j_a & (self.lamb_a != 0))
+        counts = np.bincount(self.edge_rows, minlength=self.n)
+        self.nonempty_rows = counts > 0
+        self.edge_starts = (np.cumsum(counts) - counts)[self.nonempty_rows]
+        self.edge_j = self.j_a[self.edge_rows, self.edge_cols]
+        self.edge_lamb = self.lamb_a[self.edge_rows, self.edge_cols]
+        self.edge_a = self.a_a[self.edge_rows, self.edge_cols]
+        if self.q == np.inf:
+            # Log-weights of the Cobb-Douglas unit costs and production function
+            self.h = np.bincount(self.edge_rows, weights=self.edge_a * np.log(self.edge_j / self.edge_a),
+                                 minlength=self.n)
+            self.h_prod = np.bincount(self.edge_rows, weights=self.edge_a * np.log(self.edge_j), minlength=self.n)
+        elif self.q != 0:
+            # Exponentiated weights of the CES production function
+            self.edge_w = self.edge_a * np.power(self.edge_j, 1. / self.q)
+
+    def edge_sum(self, values):
+        """
+        Sums values defined on the edges of the network over the rows of the network.
+        :param values: array of edge values, or time-series of such arrays,
+        :return: Row sums.
+        """
+        if np.ndim(values) == 1:
+            return np.bincount(self.edge_rows, weights=values, minlength=self.n)
+        sums = np.zeros(np.shape(values)[:-1] + (self.n,))
+        np.add.at(sums, (slice(None), self.edge_rows), values)
+        return sums
+
+    def column_sums(self, q):
+        """
+        Total quantities of labour and goods in an edge-list of exchanged or demanded quantities.
+        :param q: edge-list of consumptions followed by quantities along the edges of the network, or time-series of
+        such edge-lists,
+        :return: Total labour and goods.
+        """
+        if np.ndim(q) == 1:
+            total = np.bincount(self.edge_cols, weights=q[self.n:], minlength=self.n + 1)
+        else:
+            total = np.zeros(np.shape(q)[:-1] + (self.n + 1,))
+            np.add.at(total, (slice(None), self.edge_cols), q[:, self.n:])
+        total[..., 1:] += q[..., :self.n]
+        return total
+
+    def edge_min(self, values):
+        """
+        Minimum of values defined on the edges of the network over the rows of the network, ignoring nans.
+        :param values: array of edge values,
+        :return: Row minima, nan for firms without inputs.
+        """
+        res = np.full(self.n, np.nan)
+        res[self.nonempty_rows] = np.fmin.reduceat(values, self.edge_starts)
+        return res
+
+    def leontief_ratios(self, q_available):
+        """
+        Number of units that can be produced with the available quantities under a Leontief production function.
+        :param q_available: available labour and goods for production along the edges of the network,
+        :return: Minimum over inputs of available over required quantities.
+        """
+        return self.edge_min(q_available / self.edge_j)
 
     def get_eps_cal(self):
         """
@@ -295,20 +572,16 @@ class Economy:
     def production_function(self, q_available):
         """
         CES production function.
-        :param q_available: matrix of available labour and goods for production,
+        :param q_available: available labour and goods for production along the edges of the network,
         :return: production levels of the firms.
         """
         if self.q == 0:
-            return np.power(np.nanmin(np.divide(q_available, self.j_a),
-                                      axis=1), self.b)
+            return np.power(self.leontief_ratios(q_available), self.b)
         elif self.q == np.inf:
-            return np.power(np.nanprod(np.power(np.divide(q_available, self.j_a),
-                                                self.a_a),
-                                       axis=1),
+            return np.power(np.exp(self.edge_sum(self.edge_a * np.log(q_available)) - self.h_prod),
                             self.b)
         else:
-            return np.power(np.nansum(self.a_a * np.power(self.j_a, 1. / self.q)
-                                      / np.power(q_available, 1. / self.q), axis=1),
+            return np.power(self.edge_sum(self.edge_w / np.power(q_available, 1. / self.q)),
                             - self.b * self.q)
 
     def compute_eq(self):
@@ -321,7 +594,7 @@ class Economy:
         :return: side effect.
         """
         if self.q == np.inf:
-            h = np.sum(self.a_a * np.log(np.ma.masked_invalid(np.divide(self.j_a, self.a_a))), axis=1)
+            h = self.h
             v = lstsq(np.eye(self.n) - self.a.T,
                       self.kappa,
                       rcond=10e-7)[0]
@@ -354,6 +627,7 @@ class Economy:
                                      self.firms.z * init_guess_geq * np.log(init_guess_geq),
                                      rcond=10e-7)[0]
 
+                    from scipy.optimize import leastsq
                     pg = leastsq(lambda x: self.non_linear_eq_qzero(x, *par),
                                  np.array(np.concatenate((init_guess_peq + (1 - self.b) * pert_peq,
                                                           np.power(init_guess_geq + (1 - self.b) * (
@@ -385,6 +659,7 @@ class Economy:
                            self.kappa
                            )
 
+                    from scipy.optimize import leastsq
                     uw = leastsq(lambda x: self.non_linear_eq_qnonzero(x, *par),
                                  np.concatenate((init_guess_u, init_guess_w)),
                                  )[0]
@@ -416,49 +691,119 @@ class Economy:
                               rcond=None)[0]
                     self.g_eq = np.divide(w, np.power(self.firms.z, self.q * self.zeta) * np.power(u, self.q))
 
-        self.labour_eq = np.power(self.mu_eq * self.house.f, 1. / self.house.phi) / self.house.v_phi
+        self.compute_eq_house()
+
+    def compute_eq_house(self):
+        """
+        Computes the equilibrium quantities of the household from equilibrium prices.
+        :return: side effect.
+        """
+        labour_eq = np.power(self.mu_eq * self.house.f, 1. / self.house.phi) / self.house.v_phi
+        self.labour_eq = np.sum(labour_eq)
         self.cons_eq = self.kappa / self.p_eq
-        self.b_eq = np.sum(self.house.theta) / self.mu_eq
-        self.utility_eq = np.dot(self.house.theta, np.log(self.cons_eq)) - self.house.gamma * np.power(
-            self.labour_eq / self.house.l_0,
-            self.house.phi + 1) / (
-                self.house.phi + 1)
-
-    def save_eco(self, name):
-        """
-        Saves the economy as multi-indexed data-frame in hdf format along with networks in npy format.
-        :param name: name of file,
-        """
-        first_index = np.concatenate((np.repeat('Firms', 11), np.repeat('Household', 11)))
-        second_index = np.concatenate(
-            (['q', 'b', 'z', 'sigma', 'alpha', 'alpha_p', 'beta', 'beta_p', 'w', 'p_eq', 'g_eq'],
-             ['l', 'theta', 'gamma', 'phi']))
-        multi_index = [first_index, second_index]
-        values = np.vstack((self.q * np.ones(self.n),
-                            self.b * np.ones(self.n),
-                            self.firms.z,
-                            self.firms.sigma,
-                            self.firms.alpha * np.ones(self.n),
-                            self.firms.alpha_p * np.ones(self.n),
-                            self.firms.beta * np.ones(self.n),
-                            self.firms.beta_p * np.ones(self.n),
-                            self.firms.w * np.ones(self.n),
-                            self.p_eq,
-                            self.g_eq,
-                            self.house.l_0 * np.ones(self.n),
-                            self.house.theta,
-                            self.house.gamma * np.ones(self.n),
-                            self.house.phi * np.ones(self.n),
-                            ))
-
-        df_eco = pd.DataFrame(values,
-                              index=multi_index,
-                              columns=[np.arange(1, self.n + 1)]
-                              )
-        df_eco.to_hdf(name + '/eco.h5', key='df', mode='w')
-        np.save(name + '/network.npy', self.j_a)
-        if self.q != 0:
-            np.save(name + '/sub_network.npy', self.a_a)
+        self.b_eq = np.sum(np.sum(self.house.theta, axis=-1) / self.mu_eq)
+        if np.ndim(self.mu_eq) == 0:
+            self.utility_eq = np.dot(self.house.theta, np.log(self.cons_eq)) - self.house.gamma * np.power(
+                self.labour_eq / self.house.l_0,
+                self.house.phi + 1) / (
+                    self.house.phi + 1)
+        else:
+            # Utilities of each household at equilibrium
+            self.utility_eq = self.house.utility(self.house.theta / np.outer(self.mu_eq, self.p_eq), labour_eq)
+
+    def get_state(self, sparse=False):
+        """
+        Splits the economy into scalar values and arrays (parameters, networks, edge tables and cached equilibrium).
+        Dense networks come with all their derived matrices so that the economy can be rebuilt from them without any
+        computation, sparse networks as their non-zero entries only.
+        :param sparse: whether or not to give the networks as lists of non-zero entries, default False,
+        :return: Dictionary of the scalar values and of the names of arrays, dictionary of arrays.
+        """
+        values = {'j0': self.j0, 'a0': self.a0, 'v': self.v, 'kappa': self.kappa}
+        values.update({'firms.' + key: getattr(self.firms, key) for key in self.firms_params})
+        values.update({'house.' + key: getattr(self.house, key) for key in self.house_params})
+        values.update({key: getattr(self, key) for key in self.eq_quantities + self.edge_tables})
+        if sparse:
+            rows, cols = np.nonzero((self.j != 0) | (self.a != 0))
+            values.update({'rows': rows, 'cols': cols, 'j': self.j[rows, cols], 'a': self.a[rows, cols]})
+        else:
+            values.update({key: getattr(self, key) for key in self.dense_networks})
+
+        meta = {'n': self.n, 'q': self.q, 'b': self.b, 'sparse': sparse, 'household': type(self.house).__name__,
+                'scalars': {}, 'arrays': []}
+        arrays = {}
+        for key, value in values.items():
+            if value is None or np.ndim(value) == 0:
+                meta['scalars'][key] = None if value is None else np.asarray(value).item()
+            else:
+                arrays[key] = value
+                meta['arrays'].append(key)
+        return meta, arrays
+
+    @staticmethod
+    def from_state(meta, arrays):
+        """
+        Rebuilds an economy from the output of get_state, with its cached equilibrium. Dense networks are used as
+        given, without copy, so that they can be memory-mapped or in shared memory.
+        :param meta: dictionary of the scalar values and of the names of arrays,
+        :param arrays: dictionary of arrays,
+        :return: Economy.
+        """
+        values = dict(meta['scalars'])
+        values.update(arrays)
+        n = meta['n']
+        if meta['sparse']:
+            j, a = np.zeros((n, n)), np.zeros((n, n))
+            j[values['rows'], values['cols']] = values['j']
+            a[values['rows'], values['cols']] = values['a']
+        else:
+            j, a = values['j_a'][:, 1:], values['a_a'][:, 1:]
+        e = Economy(n, None, None, None, values['j0'], values['a0'], meta['q'], meta['b'], j=j, a=a)
+        e.init_firms(*[values['firms.' + key] for key in Economy.firms_params])
+        if meta['household'] == 'Households':
+            e.init_households(*[values['house.' + key] for key in Economy.house_params])
+        else:
+            e.init_house(*[values['house.' + key] for key in Economy.house_params])
+
+        if meta['sparse']:
+            e.set_quantities()
+        else:
+            for key in Economy.dense_networks:
+                setattr(e, key, values[key])
+            e.lamb = e.lamb_a[:, 1:]
+        for key in ('v', 'kappa') + Economy.eq_quantities + Economy.edge_tables:
+            setattr(e, key, values[key])
+        return e
+
+    def save_eco(self, name, sparse=False):
+        """
+        Saves the economy in directory name: scalar values in economy.json and arrays as npy files, see get_state.
+        :param name: name of directory,
+        :param sparse: whether or not to save the networks as lists of non-zero entries, default False.
+        :return: side effect.
+        """
+        os.makedirs(name, exist_ok=True)
+        meta, arrays = self.get_state(sparse)
+        for key, value in arrays.items():
+            np.save(os.path.join(name, key + '.npy'), value)
+        with open(os.path.join(name, 'economy.json'), 'w') as f:
+            json.dump(meta, f, indent=1)
+
+    @staticmethod
+    def load_eco(name, mmap_mode='r'):
+        """
+        Loads an economy saved by save_eco, with its cached equilibrium. Dense networks and their derived matrices are
+        memory-mapped so that processes opening the same economy share its pages instead of copying them.
+        :param name: name of directory,
+        :param mmap_mode: memory-map mode of the dense networks, None to load them in memory, default 'r' (read-only),
+        :return: Economy.
+        """
+        with open(os.path.join(name, 'economy.json')) as f:
+            meta = json.load(f)
+        arrays = {key: np.load(os.path.join(name, key + '.npy'),
+                               mmap_mode=None if meta['sparse'] or key not in Economy.dense_networks else mmap_mode)
+                  for key in meta['arrays']}
+        return Economy.from_state(meta, arrays)
 
     # Fixed point equations for equilibrium computation
 
@@ -92,32 +92,49 @@ class Firms:
         """
         return np.exp(- 2 * self.omega * step_s * (labour_balance / total_labour))
 
-    def compute_targets(self, prices, q_forecast, supply, prods, step_s):
+    def compute_targets(self, prices, q_forecast, supply, prods, step_s, e):
         """
         Computes the production target based on profit and balance forecasts.
         :param prices: current rescaled prices,
-        :param q_forecast: forecast exchanged quantities,
+        :param q_forecast: edge-list of forecast exchanged quantities,
         :param supply: current supply,
         :param prods: current production levels,
         :param step_s: size of time-step,
+        :param e: economy class,
         :return: Production targets for the next period.
         """
-        est_profits, est_balance, est_cashflow, est_tradeflow = self.compute_forecasts(prices, q_forecast, supply)
+        est_profits, est_balance, est_cashflow, est_tradeflow = self.compute_forecasts(prices, q_forecast, supply, e)
         return prods * np.exp(2 * step_s * (self.beta * est_profits / est_cashflow
                               - self.beta_p * est_balance[1:] / est_tradeflow[1:]))
 
     @staticmethod
-    def compute_profits_balance(prices, q_exchange, supply, demand):
+    def compute_gains_losses(prices, q, e):
+        """
+        Computes gains and losses of firms from an edge-list of quantities as segment sums over the network's edges.
+        :param prices: current wage-rescaled prices,
+        :param q: edge-list of consumptions followed by quantities along the edges of the economy's network, or
+        time-series of such edge-lists along with time-series of prices,
+        :param e: economy class,
+        :return: Wage-rescaled gains, losses and total quantities of labour and goods.
+        """
+        total = e.column_sums(q)
+        gain = prices * total[..., 1:]
+        prices_ext = np.concatenate((np.ones(np.shape(prices)[:-1] + (1,)), prices), axis=-1)
+        losses = e.edge_sum(q[..., e.n:] * prices_ext[..., e.edge_cols])
+        return gain, losses, total
+
+    @staticmethod
+    def compute_profits_balance(prices, q_exchange, supply, demand, e):
         """
         Compute the real profits and balances of firms.
         :param prices: current wage-rescaled prices,
-        :param q_exchange: matrix of exchanged goods, labor and consumptions,
+        :param q_exchange: edge-list of exchanged goods, labor and consumptions,
         :param supply: current supply,
         :param demand: current demand,
+        :param e: economy class,
         :return: Realized wage-rescaled values of profits, balance, cash-flow, trade-flow.
         """
-        gain = prices * np.sum(q_exchange[:, 1:], axis=0)
-        losses = np.matmul(q_exchange[1:, :], np.concatenate((np.array([1]), prices)))
+        gain, losses, _ = Firms.compute_gains_losses(prices, q_exchange, e)
 
         return gain - losses, supply - demand, gain + losses, supply + demand
 
@@ -128,42 +145,32 @@ class Firms:
         :param e: economy class,
         :param targets: production targets for the next period,
         :param prices: current wages-rescaled prices,
-        :return: Matrix of optimal goods/labor quantities.
+        :return: Optimal goods/labor quantities along the edges of the economy's network.
         """
+        prices_a = np.concatenate((np.array([1]), prices))[e.edge_cols]
         if e.q == 0:
-            demanded_products_labor = np.matmul(np.diag(np.power(targets, 1. / e.b)),
-                                                e.lamb_a)
+            demanded = np.power(targets, 1. / e.b)[e.edge_rows] * e.edge_lamb
         elif e.q == np.inf:
-            prices_net_aux = np.array([
-                np.prod(np.power(e.j_a[i, :] * np.concatenate((np.array([1]), prices)) /
-                                 e.a_a[i, :], e.a_a[i, :])[e.zeros_j_a[i, :]])
-                for i in range(e.n)
-            ])
-            demanded_products_labor = np.multiply(e.a_a,
-                                                  np.outer(np.multiply(prices_net_aux,
-                                                                       np.power(targets, 1. / e.b)),
-                                                           np.concatenate((np.array([1]), 1. / prices))
-                                                           ))
+            # Unit costs prod_k (j_ik p_k / a_ik) ^ a_ik are computed in log-space as a sparse product over edges
+            prices_net_aux = np.exp(e.h + e.edge_sum(e.edge_a * np.log(prices_a)))
+            demanded = e.edge_a * np.multiply(prices_net_aux, np.power(targets, 1. / e.b))[e.edge_rows] / prices_a
         else:
-            prices_net = np.matmul(e.lamb_a, np.power(np.concatenate(([1], prices)), e.zeta))
-            demanded_products_labor = np.multiply(e.lamb_a,
-                                                  np.outer(np.multiply(np.power(prices_net, e.q),
-                                                                       np.power(targets, 1. / e.b)),
-                                                           np.power(np.concatenate((np.array([1]), prices)),
-                                                                    - e.q / (1 + e.q))))
-        return demanded_products_labor
+            prices_net = e.edge_sum(e.edge_lamb * np.power(prices_a, e.zeta))
+            demanded = e.edge_lamb * np.multiply(np.power(prices_net, e.q),
+                                                 np.power(targets, 1. / e.b))[e.edge_rows] * np.power(prices_a,
+                                                                                                      - e.q / (1 + e.q))
+        return demanded
 
     @staticmethod
-    def compute_forecasts(prices, q_forecast, supply):
+    def compute_forecasts(prices, q_forecast, supply, e):
         """
         Computes the expected profits and balances assuming same demands as previous time.
         :param prices: current wage-rescaled prices,
-        :param q_forecast: forecast exchanged quantities,
+        :param q_forecast: edge-list of forecast exchanged quantities,
         :param supply: current supply,
+        :param e: economy class,
         :return: Forecast of profits, balance, cash-flow and trade-flow.
         """
-        exp_gain = prices * np.sum(q_forecast[:, 1:], axis=0)
-        exp_losses = np.matmul(q_forecast[1:, :], np.concatenate((np.array([1]), prices)))
+        exp_gain, exp_losses, exp_demand = Firms.compute_gains_losses(prices, q_forecast, e)
         exp_supply = supply
-        exp_demand = np.sum(q_forecast, axis=0)
         return exp_gain - exp_losses, exp_supply - exp_demand, exp_gain + exp_losses, exp_supply + exp_demand
@@ -80,7 +80,7 @@ class PlotlyDynamics:
                 self.firms = np.random.choice(self.dyn.n, self.k, replace=False) if self.k else np.arange(self.dyn.n)
             else:
                 self.firms = np.arange(self.dyn.n)
-            self.color_firms = np.array([self.cmap(i / self.dyn.n) for i in range(self.dyn.n)])
+            self.color_firms = self.firm_colors()
 
             # Reconstructing gains, losses, supply, demand, utility, budget and extract diagonal stocks
             self.gains, self.losses, self.supply, self.demand = self.dyn.compute_gains_losses_supplies_demand(
@@ -90,22 +90,24 @@ class PlotlyDynamics:
                 self.dyn.prices,
                 self.dyn.prods,
                 self.dyn.stocks,
-                self.dyn.labour)
-            self.utility, self.budget = self.dyn.compute_utility_budget(self.dyn.eco,
-                                                                        self.dyn.q_exchange,
-                                                                        self.dyn.prices,
-                                                                        self.dyn.wages,
-                                                                        self.dyn.t_max,
-                                                                        self.dyn.step_s,
-                                                                        self.dyn.B0)
-            self.diag_stocks = np.array([np.diag(stock) for stock in self.dyn.stocks])
+                self.dyn.labour,
+                self.dyn.productivities())
+            self.utility, self.budget = self.dyn.utility_budget()
+            self.diag_stocks = self.dyn.stocks
+
+    def firm_colors(self):
+        """
+        :return: Plotly rgba strings of the colors of the firms in the colormap.
+        """
+        return ['rgba(%d, %d, %d, %g)' % (255 * r, 255 * g, 255 * b, a)
+                for r, g, b, a in self.cmap(np.arange(self.dyn.n) / self.dyn.n)]
 
     # Setters methods
     def update_dyn(self, dyn):
         if dyn:
             self.dyn = dyn
             self.firms = np.random.choice(self.dyn.n, self.k, replace=False) if self.k else np.arange(self.dyn.n)
-            self.color_firms = np.array([self.cmap(i / self.dyn.n) for i in range(self.dyn.n)])
+            self.color_firms = self.firm_colors()
             self.gains, self.losses, self.supply, self.demand = self.dyn.compute_gains_losses_supplies_demand(
                 self.dyn.eco,
                 self.dyn.q_demand,
@@ -113,15 +115,10 @@ class PlotlyDynamics:
                 self.dyn.prices,
                 self.dyn.prods,
                 self.dyn.stocks,
-                self.dyn.labour)
-            self.utility, self.budget = self.dyn.compute_utility_budget(self.dyn.eco,
-                                                                        self.dyn.q_exchange,
-                                                                        self.dyn.prices,
-                                                                        self.dyn.wages,
-                                                                        self.dyn.t_max,
-                                                                        self.dyn.step_s,
-                                                                        self.dyn.B0)
-            self.diag_stocks = np.array([np.diag(stock) for stock in self.dyn.stocks])
+                self.dyn.labour,
+                self.dyn.productivities())
+            self.utility, self.budget = self.dyn.utility_budget()
+            self.diag_stocks = self.dyn.stocks
 
     def run_dyn(self):
         # self.dyn.set_initial_conditions(p0, w0, g0, t1, s0, B0)
@@ -133,15 +130,10 @@ class PlotlyDynamics:
             self.dyn.prices,
             self.dyn.prods,
             self.dyn.stocks,
-            self.dyn.labour)
-        self.utility, self.budget = self.dyn.compute_utility_budget(self.dyn.eco,
-                                                                    self.dyn.q_exchange,
-                                                                    self.dyn.prices,
-                                                                    self.dyn.wages,
-                                                                    self.dyn.t_max,
-                                                                    self.dyn.step_s,
-                                                                    self.dyn.B0)
-        self.diag_stocks = np.array([np.diag(stock) for stock in self.dyn.stocks])
+            self.dyn.labour,
+            self.dyn.productivities())
+        self.utility, self.budget = self.dyn.utility_budget()
+        self.diag_stocks = self.dyn.stocks
 
     def update_k(self, k):
         self.k = k
@@ -164,20 +156,20 @@ class PlotlyDynamics:
         fig.update_yaxes(title_text=self.wage_label, row=2, col=2)
         if from_eq:
             for firm in self.firms:
-                fig.add_trace(go.Scatter(x=np.arange(self.dyn.t_max),
-                                         y=self.dyn.q_exchange[1:-1, 0, firm + 1] - self.dyn.eco.cons_eq[firm],
+                fig.add_trace(go.Scatter(x=self.dyn.times[1:-1],
+                                         y=self.dyn.q_exchange[1:-1, firm] - self.dyn.eco.cons_eq[firm],
                                          mode='lines',
-                                         marker=dict(color='rgba' + str(tuple(self.color_firms[firm])))),
+                                         marker=dict(color=self.color_firms[firm])),
                               row=1, col=1)
-            fig.add_trace(go.Scatter(x=np.arange(self.dyn.t_max),
-                                     y=self.utility[1:-1] - self.dyn.eco.utility_eq,
+            fig.add_trace(go.Scatter(x=self.dyn.times[1:-1],
+                                     y=self.utility[1:-1] - np.sum(self.dyn.eco.utility_eq),
                                      mode='lines'),
                           row=1, col=2)
-            fig.add_trace(go.Scatter(x=np.arange(self.dyn.t_max),
+            fig.add_trace(go.Scatter(x=self.dyn.times[1:-1],
                                      y=self.budget[1:-1] - self.dyn.eco.b_eq,
                                      mode='lines'),
                           row=2, col=1)
-            fig.add_trace(go.Scatter(x=np.arange(self.dyn.t_max),
+            fig.add_trace(go.Scatter(x=self.dyn.times[1:-1],
                                      y=self.dyn.wages[1:-1] - 1,
                                      mode='lines'),
                           row=2, col=2)
@@ -187,22 +179,22 @@ class PlotlyDynamics:
                              showexponent='last')
         else:
             for firm in self.firms:
-                fig.add_trace(go.Scatter(x=np.arange(self.dyn.t_max),
-                                         y=self.dyn.q_exchange[1:-1, 0, firm + 1],
+                fig.add_trace(go.Scatter(x=self.dyn.times[1:-1],
+                                         y=self.dyn.q_exchange[1:-1, firm],
                                          mode='lines',
                                          marker=dict(
-                                             color='rgba' + str(tuple(self.color_firms[firm])))
+                                             color=self.color_firms[firm])
                                          ),
                               row=1, col=1)
-            fig.add_trace(go.Scatter(x=np.arange(self.dyn.t_max),
+            fig.add_trace(go.Scatter(x=self.dyn.times[1:-1],
                                      y=self.utility[1:-1],
                                      mode='lines'),
                           row=1, col=2)
-            fig.add_trace(go.Scatter(x=np.arange(self.dyn.t_max),
+            fig.add_trace(go.Scatter(x=self.dyn.times[1:-1],
                                      y=self.budget[1:-1],
                                      mode='lines'),
                           row=2, col=1)
-            fig.add_trace(go.Scatter(x=np.arange(self.dyn.t_max),
+            fig.add_trace(go.Scatter(x=self.dyn.times[1:-1],
                                      y=self.dyn.wages[1:-1],
                                      mode='lines'),
                           row=2, col=2)
@@ -394,7 +386,7 @@ class PlotlyDynamics:
         fig.update_xaxes(title_text=r'$t$', row=2, col=1)
         fig.update_yaxes(title_text=self.surplus_bar_label, showticksuffix='last', row=1, col=1)
         fig.update_yaxes(title_text=self.profits_bar_label, row=2, col=1)
-        fig.add_trace(go.Scatter(x=np.arange(self.dyn.t_max - 1),
+        fig.add_trace(go.Scatter(x=self.dyn.times[1:-1],
                                  y=(self.supply[1:-1, 0] - self.demand[1:-1, 0]) / (
                                          self.supply[1:-1, 0] + self.demand[1:-1, 0]),
                                  mode='lines',
@@ -404,19 +396,19 @@ class PlotlyDynamics:
                       row=1,
                       col=1)
         for firm in self.firms:
-            fig.add_trace(go.Scatter(x=np.arange(self.dyn.t_max - 1),
+            fig.add_trace(go.Scatter(x=self.dyn.times[1:-1],
                                      y=(self.supply[1:-1, firm + 1] - self.demand[1:-1, firm + 1]) / (
                                              self.supply[1:-1, firm + 1] + self.demand[1:-1, firm + 1]),
                                      mode='lines',
-                                     marker=dict(color='rgba' + str(tuple(self.color_firms[firm]))),
+                                     marker=dict(color=self.color_firms[firm]),
                                      showlegend=False),
                           row=1,
                           col=1)
-            fig.add_trace(go.Scatter(x=np.arange(self.dyn.t_max - 1),
+            fig.add_trace(go.Scatter(x=self.dyn.times[1:-1],
                                      y=(self.gains[1:-1, firm] - self.losses[1:-1, firm]) / (
                                              self.gains[1:-1, firm] + self.losses[1:-1, firm]),
                                      mode='lines',
-                                     marker=dict(color='rgba' + str(tuple(self.color_firms[firm]))),
+                                     marker=dict(color=self.color_firms[firm]),
                                      showlegend=False),
                           row=2,
                           col=1)
@@ -445,44 +437,44 @@ class PlotlyDynamics:
         fig.update_yaxes(title_text=self.stocks_label, row=3, col=1)
         for firm in self.firms:
             if from_eq:
-                fig.add_trace(go.Scatter(x=np.arange(self.dyn.t_max),
+                fig.add_trace(go.Scatter(x=self.dyn.times[1:],
                                          y=self.dyn.prices[1:, firm] - self.dyn.eco.p_eq[firm],
                                          mode='lines',
                                          marker=dict(
-                                             color='rgba' + str(tuple(self.color_firms[firm])))),
+                                             color=self.color_firms[firm])),
                               row=1, col=1)
-                fig.add_trace(go.Scatter(x=np.arange(self.dyn.t_max),
+                fig.add_trace(go.Scatter(x=self.dyn.times[1:],
                                          y=self.dyn.prods[1:, firm] - self.dyn.eco.g_eq[firm],
                                          mode='lines',
                                          marker=dict(
-                                             color='rgba' + str(tuple(self.color_firms[firm])))),
+                                             color=self.color_firms[firm])),
                               row=2, col=1)
-                fig.add_trace(go.Scatter(x=np.arange(self.dyn.t_max),
+                fig.add_trace(go.Scatter(x=self.dyn.times[1:],
                                          y=self.diag_stocks[1:, firm],
                                          mode='lines',
                                          marker=dict(
-                                             color='rgba' + str(tuple(self.color_firms[firm])))),
+                                             color=self.color_firms[firm])),
                               row=3, col=1)
             else:
-                fig.add_trace(go.Scatter(x=np.arange(self.dyn.t_max),
+                fig.add_trace(go.Scatter(x=self.dyn.times[1:],
                                          y=self.dyn.prices[1:, firm],
                                          mode='lines',
                                          marker=dict(
-                                             color='rgba' + str(tuple(self.color_firms[firm])))
+                                             color=self.color_firms[firm])
                                          ),
                               row=1, col=1)
-                fig.add_trace(go.Scatter(x=np.arange(self.dyn.t_max),
+                fig.add_trace(go.Scatter(x=self.dyn.times[1:],
                                          y=self.dyn.prods[1:, firm],
                                          mode='lines',
                                          marker=dict(
-                                             color='rgba' + str(tuple(self.color_firms[firm])))
+                                             color=self.color_firms[firm])
                                          ),
                               row=2, col=1)
-                fig.add_trace(go.Scatter(x=np.arange(self.dyn.t_max),
+                fig.add_trace(go.Scatter(x=self.dyn.times[1:],
                                          y=self.diag_stocks[1:, firm],
                                          mode='lines',
                                          marker=dict(
-                                             color='rgba' + str(tuple(self.color_firms[firm])))
+                                             color=self.color_firms[firm])
                                          ),
                               row=3, col=1)
         fig.update_layout(showlegend=False)
@@ -499,13 +491,13 @@ class PlotlyDynamics:
             "data": dict(type='heatmapgl',
                          x=np.arange(1, self.dyn.n + 1),
                          y=np.arange(1, self.dyn.n + 1),
-                         z=self.dyn.q_exchange[1, 1:, 1:],
+                         z=self.dyn.dense_matrix(self.dyn.q_exchange[1])[1:, 1:],
                          zmin=0,
                          colorbar=dict(thickness=20, ticklen=4)),
             "layout": dict(width=700,
                            height=700),
             "frames": [dict(data=dict(type='heatmapgl',
-                                      z=self.dyn.Q_real[time, 1:, 1:]),
+                                      z=self.dyn.dense_matrix(self.dyn.q_exchange[time])[1:, 1:]),
                             name=str(time)
                             )
                        for time in range(1, len(self.dyn.q_exchange))]
@@ -22,7 +22,6 @@ This module declares the Household class which model one representative househol
 The attributes of this class are all the fixed parameters defining the household.
 """
 import numpy as np
-from scipy.optimize import fsolve
 
 
 class Household(object):
@@ -78,7 +77,8 @@ class Household(object):
                                                                                 1. + self.phi) / (
                        1. + self.phi)
 
-    def compute_demand_cons_labour_supply(self, savings, prices, labour_supply, labour_demand, step_s):
+    def compute_demand_cons_labour_supply(self, savings, prices, labour_supply, labour_demand, step_s,
+                                          preference_shocks=None):
         """
         Optimization sequence carried by the household.
         :param savings: wage-rescaled savings for the next period,
@@ -86,12 +86,15 @@ class Household(object):
         :param labour_supply: realized supply of labor of the current period,
         :param labour_demand: realized demand for labor of the current period,
         :param step_s: size of time-step,
+        :param preference_shocks: multiplicative shocks on the preference factors,
         :return: Consumption targets and labor supply for the next period.
         """
 
         # Update preferences taking confidence effects into account
         theta = self.theta * np.exp(- self.omega_p * step_s * (labour_supply - labour_demand) /
                                     (labour_supply + labour_demand))
+        if preference_shocks is not None:
+            theta = theta * preference_shocks
 
         if self.phi == 1:
             mu = .5 * (np.sqrt(np.power(savings * self.v_phi, 2)
@@ -100,6 +103,7 @@ class Household(object):
         elif self.phi == np.inf:
             mu = np.sum(theta) / (self.l_0 + savings) / self.f
         else:
+            from scipy.optimize import fsolve
             mu = fsolve(self.fixed_point_mu,
                         np.power(np.sum(theta) * self.v_phi, self.phi / (1 + self.phi)) / 2.,
                         args=([np.sum(theta), self.v_phi, self.phi, self.f, savings]))
@@ -110,3 +114,148 @@ class Household(object):
     def fixed_point_mu(x, p):
         thetabar, vphi, phi, f, savings = p
         return np.power(x * f, 1+1./phi) / vphi + savings * x * f - thetabar
+
+
+class Households(object):
+
+    def __init__(self, l_0, theta, gamma, phi, omega_p=None, f=None, r=None):
+        """
+        Population of H heterogeneous households. Every parameter is either shared by the whole population (scalar)
+        or given per household (array of size H), except preferences which form a (H, n) matrix.
+        :param l_0: baseline work offers,
+        :param theta: (H, n) matrix of preferency factors,
+        :param gamma: aversions to work,
+        :param phi: Frisch indices,
+        :param omega_p: confidence parameters,
+        :param f: fractions of budget to use for consumption,
+        :param r: savings growth rates.
+        """
+        self.theta = np.atleast_2d(theta)  # Preferency factors
+        self.h = self.theta.shape[0]  # Number of households
+
+        # Primary instances
+        self.l_0 = self.broadcast(l_0)  # Baseline work offers
+        self.gamma = self.broadcast(gamma)  # Aversions to work
+        self.phi = self.broadcast(phi)  # Frisch indices
+        self.omega_p = self.broadcast(omega_p if omega_p is not None else 0)  # Confidence parameters
+        self.f = self.broadcast(f if f is not None else 1)  # Fractions of budget to use for consumption
+        self.r = self.broadcast(r if r is not None else 0)  # Savings growth rates
+
+        if (self.f <= 0).any():
+            raise Exception("Fractions of budget to use for consumption must be positive.")
+
+        # Secondary instance
+        self.v_phi = np.power(self.gamma, 1. / self.phi) / np.power(self.l_0, 1 + 1. / self.phi)
+
+    def broadcast(self, x):
+        """
+        Broadcasts a household parameter to the size of the population.
+        :param x: scalar or array of size H,
+        :return: Array of size H.
+        """
+        x = np.asarray(x, dtype=float)
+        if x.ndim > 1 or (x.ndim == 1 and x.shape[0] != self.h):
+            raise ValueError('Household parameters must be scalars or arrays of size %d' % self.h)
+        return np.array(np.broadcast_to(x, (self.h,)))
+
+    # Setters for class instances
+
+    def update_labour(self, labour):
+        self.l_0 = self.broadcast(labour)
+        self.v_phi = np.power(self.gamma, 1. / self.phi) / np.power(self.l_0, 1 + 1. / self.phi)
+
+    def update_theta(self, theta):
+        if np.atleast_2d(theta).shape != self.theta.shape:
+            raise ValueError('Preferences must be of size (%d, %d)' % self.theta.shape)
+        self.theta = np.atleast_2d(theta)
+
+    def update_gamma(self, gamma):
+        self.gamma = self.broadcast(gamma)
+        self.v_phi = np.power(self.gamma, 1. / self.phi) / np.power(self.l_0, 1 + 1. / self.phi)
+
+    def update_phi(self, phi):
+        self.phi = self.broadcast(phi)
+        self.v_phi = np.power(self.gamma, 1. / self.phi) / np.power(self.l_0, 1 + 1. / self.phi)
+
+    def update_w_p(self, omega_p):
+        self.omega_p = self.broadcast(omega_p)
+
+    def update_f(self, f):
+        self.f = self.broadcast(f)
+
+    def update_r(self, r):
+        self.r = self.broadcast(r)
+
+    def utility(self, consumption, working_hours):
+        """
+        Utility functions of every household.
+        :param consumption: (H, n) matrix of current consumptions,
+        :param working_hours: realized labor hours of each household,
+        :return: Values of the utility functions.
+        """
+        return np.sum(self.theta * np.log(consumption), axis=1) - self.gamma * np.power(working_hours / self.l_0,
+                                                                                         1. + self.phi) / (
+                       1. + self.phi)
+
+    def compute_demand_cons_labour_supply(self, savings, prices, labour_supply, labour_demand, step_s,
+                                          preference_shocks=None):
+        """
+        Optimization sequence carried by every household at once.
+        :param savings: wage-rescaled savings of each household for the next period,
+        :param prices: wage-rescaled prices for the next period,
+        :param labour_supply: realized aggregate supply of labor of the current period,
+        :param labour_demand: realized aggregate demand for labor of the current period,
+        :param step_s: size of time-step,
+        :param preference_shocks: multiplicative shocks on the preference factors of every household,
+        :return: (H, n) matrix of consumption targets and labor supplies for the next period.
+        """
+
+        # Update preferences taking confidence effects into account
+        theta = self.theta * np.exp(- self.omega_p * step_s * (labour_supply - labour_demand) /
+                                    (labour_supply + labour_demand))[:, None]
+        if preference_shocks is not None:
+            theta = theta * preference_shocks
+        theta_bar = np.sum(theta, axis=1)
+        savings = np.broadcast_to(savings, (self.h,))
+
+        mu = np.zeros(self.h)
+        quad = self.phi == 1
+        lin = self.phi == np.inf
+        gen = ~(quad | lin)
+        mu[quad] = .5 * (np.sqrt(np.power(savings[quad] * self.v_phi[quad], 2)
+                                 + 4 * self.v_phi[quad] * theta_bar[quad])
+                         - savings[quad] * self.v_phi[quad]) / self.f[quad]
+        mu[lin] = theta_bar[lin] / (self.l_0[lin] + savings[lin]) / self.f[lin]
+        if gen.any():
+            mu[gen] = self.solve_mu(theta_bar[gen], self.v_phi[gen], self.phi[gen], self.f[gen], savings[gen])
+
+        return theta / np.outer(mu, prices), np.power(mu * self.f, 1. / self.phi) / self.v_phi
+
+    @staticmethod
+    def solve_mu(thetabar, vphi, phi, f, savings, tol=1e-12, max_iter=100):
+        """
+        Vectorised Newton solver for the budget multipliers of households with generic Frisch indices. The function
+        solved is convex and negative at zero so that Newton's iterates started where it is positive decrease
+        monotonically towards its positive root. Without savings, its first term is positive beyond its own root;
+        with negative savings, it is started where its first term exceeds twice both the preferences and the
+        opposite of the savings term.
+        :param thetabar: total preferences of each household,
+        :param vphi: secondary disutility of work parameters,
+        :param phi: Frisch indices,
+        :param f: fractions of budget to use for consumption,
+        :param savings: wage-rescaled savings,
+        :param tol: relative tolerance,
+        :param max_iter: maximum number of iterations,
+        :return: Budget multipliers.
+        """
+        neg = savings < 0
+        x = np.power(thetabar * vphi * np.where(neg, 2, 1), phi / (1 + phi)) / f
+        x[neg] = np.maximum(x[neg], np.power(- 2 * savings[neg] * vphi[neg], phi[neg]) / f[neg])
+        for _ in range(max_iter):
+            val = np.power(x * f, 1 + 1. / phi) / vphi + savings * x * f - thetabar
+            der = f * (1 + 1. / phi) * np.power(x * f, 1. / phi) / vphi + savings * f
+            step = val / der
+            x = x - step
+            if np.all(np.abs(step) <= tol * np.abs(x)):
+                break
+        return x
@@ -20,7 +20,6 @@ The ``network`` module
 
 This module deals with various network generation useful for the model.
 """
-import networkx as nx
 import numpy as np
 
 
@@ -31,6 +30,7 @@ def undir_rrg(d, n):
     :param n: number of nodes.
     :return: Adjacency matrix of the network.
     """
+    import networkx as nx
     return np.array(nx.convert_matrix.to_numpy_array(nx.random_regular_graph(d, n)))
 
 
@@ -80,8 +80,9 @@ def mdir_rrg(d, n):
     :param n: number of nodes.
     :return: Adjacency matrix of the network.
     """
-    A1 = nx.convert_matrix.to_numpy_matrix(nx.random_regular_graph(d, n))
-    A2 = nx.convert_matrix.to_numpy_matrix(nx.random_regular_graph(d, n))
+    import networkx as nx
+    A1 = nx.convert_matrix.to_numpy_array(nx.random_regular_graph(d, n))
+    A2 = nx.convert_matrix.to_numpy_array(nx.random_regular_graph(d, n))
     return np.triu(A1) + np.tril(A2)
 
 
@@ -93,6 +94,7 @@ def er(n, p, directed=False):
     :param directed: whether or not the network is directed, default False.
     :return: Adjacency matrix of the network.
     """
+    import networkx as nx
     return np.array(nx.convert_matrix.to_numpy_array(nx.binomial_graph(n, p, directed=directed)))
 
 
@@ -149,6 +151,7 @@ def _position_communities(g, partition, **kwargs):
     :param partition: dict mapping int node -> int community graph partitions,
     :return: dict mapping int node -> (float x, float y) community positions.
     """
+    import networkx as nx
     between_community_edges = _find_between_community_edges(g, partition)
     communities = set(partition.values())
     hypergraph = nx.DiGraph()
@@ -195,6 +198,7 @@ def _position_nodes(g, partition, **kwargs):
     :param partition: dict mapping int node -> int community graph partitions,
     :return: dict mapping int node -> (float x, float y) node positions.
     """
+    import networkx as nx
     communities = dict()
     for node, community in partition.items():
         try:
@@ -0,0 +1,179 @@
+# network-economy is a simulation program for the Network Economy ABM desbribed in (TODO)
+# Copyright (C) 2020 Théo Dessertaine
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+The ``phase`` module
+======================
+
+This module declares the AdaptivePhaseSampler class which computes phase diagrams over two parameters with a quadtree:
+the simulate-and-classify pipeline is run on the corners of a coarse grid and only cells whose corners disagree are
+subdivided, down to a maximum depth. Labels are cached by point so that corners shared by neighbouring cells, or
+points already computed in a previous run given the same cache, are never recomputed. The DynamicsClassifier class
+wraps the pipeline (building an economy from the two parameters, running the dynamics and classifying it).
+"""
+import numpy as np
+
+from dynamics import Dynamics
+
+
+def classify_dynamics(dyn):
+    """
+    Classifies a run of the dynamics from the distance of prices, productions and stocks to equilibrium.
+    :param dyn: dynamics with a completed run,
+    :return: One of 'divergent', 'convergent', 'periodic' or 'other'.
+    """
+    norm = dyn.norm_prices_prods_stocks()
+    if dyn.detect_divergent(norm):
+        return 'divergent'
+    monotonic, converged, _ = dyn.detect_convergent(norm)
+    if monotonic or converged:
+        return 'convergent'
+    if dyn.detect_periodicity(norm):
+        return 'periodic'
+    return 'other'
+
+
+class DynamicsClassifier(object):
+
+    def __init__(self, build, t_max, initial_conditions=None, step_size=None):
+        """
+        Simulate-and-classify pipeline of a phase diagram.
+        :param build: function of the two parameters returning an economy with computed equilibrium,
+        :param t_max: simulation time,
+        :param initial_conditions: function of the economy returning the initial conditions (p0, w0, g0, t1, s0, B0),
+        default is a 5% perturbation of equilibrium prices and productions,
+        :param step_size: size of time-steps.
+        """
+        self.build = build
+        self.t_max = t_max
+        self.initial_conditions = initial_conditions
+        self.step_size = step_size
+
+    def __call__(self, x, y):
+        e = self.build(x, y)
+        dyn = Dynamics(e, self.t_max, step_size=self.step_size)
+        if self.initial_conditions:
+            dyn.set_initial_conditions(*self.initial_conditions(e))
+        else:
+            dyn.set_initial_conditions(1.05 * e.p_eq, 1, 0.95 * e.g_eq, e.g_eq, np.zeros(e.n), 0)
+        dyn.discrete_dynamics()
+        return classify_dynamics(dyn)
+
+
+class AdaptivePhaseSampler(object):
+
+    def __init__(self, classify, x_range, y_range, coarse=8, max_depth=3, cache=None):
+        """
+        :param classify: function of the two parameters returning a label,
+        :param x_range: bounds of the first parameter,
+        :param y_range: bounds of the second parameter,
+        :param coarse: number of cells per axis of the coarse grid,
+        :param max_depth: maximum number of subdivisions of coarse cells,
+        :param cache: dictionary of labels by point (x, y) to reuse, default is a new one.
+        """
+        self.classify = classify
+        self.x_range = x_range
+        self.y_range = y_range
+        self.coarse = coarse
+        self.max_depth = max_depth
+        self.resolution = coarse * 2 ** max_depth  # Number of cells per axis at the finest level
+        self.cache = cache if cache is not None else {}
+        self.n_runs = 0  # Number of classifications carried out by this sampler
+        self.leaves = []  # Cells (i, j, size) of the quadtree, in units of the finest level
+        self.leaf_of = None  # Index of the leaf covering each cell of the finest level
+
+    def point(self, i, j):
+        """
+        :param i: index along the first parameter on the finest lattice,
+        :param j: index along the second parameter on the finest lattice,
+        :return: Parameters (x, y) of the lattice point.
+        """
+        return (self.x_range[0] + (self.x_range[1] - self.x_range[0]) * i / self.resolution,
+                self.y_range[0] + (self.y_range[1] - self.y_range[0]) * j / self.resolution)
+
+    @staticmethod
+    def corners(i, j, size):
+        return (i, j), (i + size, j), (i, j + size), (i + size, j + size)
+
+    def evaluate(self, nodes, map_function=map):
+        """
+        Classifies the lattice points that are not cached yet.
+        :param nodes: lattice points (i, j),
+        :param map_function: map-like function applying classify to iterables of first and second parameters, e.g.
+        the map method of a concurrent.futures executor,
+        :return: side-effect
+        """
+        points = sorted({self.point(i, j) for i, j in nodes} - set(self.cache))
+        labels = map_function(self.classify, [x for x, _ in points], [y for _, y in points])
+        for point, label in zip(points, labels):
+            self.cache[point] = label
+        self.n_runs += len(points)
+
+    def label(self, i, j):
+        return self.cache[self.point(i, j)]
+
+    def run(self, map_function=map):
+        """
+        Builds the quadtree level by level, each level being classified as one batch.
+        :param map_function: map-like function applying classify to iterables of first and second parameters,
+        :return: The sampler.
+        """
+        size = 2 ** self.max_depth
+        cells = [(i * size, j * size, size) for i in range(self.coarse) for j in range(self.coarse)]
+        self.leaves = []
+        while cells:
+            self.evaluate([corner for cell in cells for corner in self.corners(*cell)], map_function)
+            refined = []
+            for i, j, size in cells:
+                if size > 1 and len({self.label(*corner) for corner in self.corners(i, j, size)}) > 1:
+                    half = size // 2
+                    refined += [(i + a * half, j + b * half, half) for a in (0, 1) for b in (0, 1)]
+                else:
+                    self.leaves.append((i, j, size))
+            cells = refined
+
+        self.leaf_of = np.zeros((self.resolution, self.resolution), dtype=int)
+        for k, (i, j, size) in enumerate(self.leaves):
+            self.leaf_of[i:i + size, j:j + size] = k
+        return self
+
+    def label_at(self, x, y):
+        """
+        Label of any point of the parameter space, given by the corner of its leaf closest to it.
+        :param x: first parameter,
+        :param y: second parameter,
+        :return: Label.
+        """
+        u = (x - self.x_range[0]) / (self.x_range[1] - self.x_range[0]) * self.resolution
+        v = (y - self.y_range[0]) / (self.y_range[1] - self.y_range[0]) * self.resolution
+        i, j, size = self.leaves[self.leaf_of[min(max(int(u), 0), self.resolution - 1),
+                                              min(max(int(v), 0), self.resolution - 1)]]
+        return self.label(i + size * int(round((u - i) / size)), j + size * int(round((v - j) / size)))
+
+    def to_grid(self, nx, ny):
+        """
+        Label map of the phase diagram at an arbitrary resolution.
+        :param nx: number of points along the first parameter,
+        :param ny: number of points along the second parameter,
+        :return: Values of the first and second parameters and (ny, nx) array of labels.
+        """
+        xs = np.linspace(self.x_range[0], self.x_range[1], nx)
+        ys = np.linspace(self.y_range[0], self.y_range[1], ny)
+        labels = np.empty((ny, nx), dtype=object)
+        for b, y in enumerate(ys):
+            for a, x in enumerate(xs):
+                labels[b, a] = self.label_at(x, y)
+        return xs, ys, labels
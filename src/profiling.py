@@ -0,0 +1,136 @@
+# network-economy is a simulation program for the Network Economy ABM desbribed in (TODO)
+# Copyright (C) 2020 Théo Dessertaine
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+The ``profiling`` module
+======================
+
+This module declares the StepProfiler class which records the wall time and allocations spent in each phase of the
+dynamics (planning, hiring, trades, price and wage updates, production, inventories and household optimization).
+A profiler is attached to a Dynamics instance with ``Dynamics.set_profiler``; without profiler the dynamics only pays
+for an empty context manager per phase.
+"""
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+
+class Phase(object):
+    """
+    Context manager timing one occurrence of a phase.
+    """
+    __slots__ = ('profiler', 'name', 'start', 'blocks', 'memory')
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+        self.start = None
+        self.blocks = None
+        self.memory = None
+
+    def __enter__(self):
+        self.blocks = sys.getallocatedblocks()
+        if self.profiler.track_memory:
+            if hasattr(tracemalloc, 'reset_peak'):
+                tracemalloc.reset_peak()
+            self.memory = tracemalloc.get_traced_memory()[0]
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        end = time.perf_counter()
+        peak = tracemalloc.get_traced_memory()[1] - self.memory if self.profiler.track_memory else 0
+        self.profiler.events.append((self.name, self.start, end - self.start,
+                                     sys.getallocatedblocks() - self.blocks, peak))
+        return False
+
+
+class StepProfiler(object):
+
+    def __init__(self, track_memory=False):
+        """
+        Profiler of the phases of the dynamics.
+        :param track_memory: whether to trace the peak memory allocated in each phase with tracemalloc, which slows
+        down the dynamics noticeably, default False.
+        """
+        self.track_memory = track_memory
+        self.events = []  # Tuples (phase, start, duration, allocated blocks, peak allocated bytes)
+        self.origin = time.perf_counter()
+        if self.track_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def phase(self, name):
+        """
+        :param name: name of the phase,
+        :return: Context manager recording the phase's wall time and allocations.
+        """
+        return Phase(self, name)
+
+    def clear(self):
+        """
+        Forgets every recorded event.
+        :return: side-effect
+        """
+        self.events = []
+        self.origin = time.perf_counter()
+
+    def summary(self):
+        """
+        :return: A data-frame with number of calls, total, mean and share of wall time, net allocated blocks and
+        maximum peak allocated bytes per phase, sorted by total time.
+        """
+        import pandas as pd
+        df = pd.DataFrame(self.events, columns=['phase', 'start', 'time', 'blocks', 'peak_bytes'])
+        df = df.groupby('phase', sort=False).agg(calls=('time', 'size'),
+                                                  total_time=('time', 'sum'),
+                                                  mean_time=('time', 'mean'),
+                                                  blocks=('blocks', 'sum'),
+                                                  peak_bytes=('peak_bytes', 'max'))
+        df['share'] = df['total_time'] / df['total_time'].sum()
+        return df.sort_values('total_time', ascending=False)
+
+    def chrome_trace(self):
+        """
+        :return: Recorded events in the Chrome trace event format (to be opened in chrome://tracing or Perfetto).
+        """
+        pid = os.getpid()
+        return {'traceEvents': [{'name': name,
+                                 'ph': 'X',
+                                 'ts': 1e6 * (start - self.origin),
+                                 'dur': 1e6 * duration,
+                                 'pid': pid,
+                                 'tid': 0,
+                                 'args': {'blocks': int(blocks), 'peak_bytes': int(peak)}}
+                                for name, start, duration, blocks, peak in self.events],
+                'displayTimeUnit': 'ms'}
+
+    def save_chrome_trace(self, name):
+        """
+        Saves the recorded events as a Chrome trace JSON file.
+        :param name: name of file,
+        """
+        with open(name, 'w') as f:
+            json.dump(self.chrome_trace(), f)
+
+    def total_time(self):
+        """
+        :return: Total wall time spent in recorded phases.
+        """
+        return np.sum([event[2] for event in self.events])
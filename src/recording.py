@@ -0,0 +1,120 @@
+# network-economy is a simulation program for the Network Economy ABM desbribed in (TODO)
+# Copyright (C) 2020 Théo Dessertaine
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+The ``recording`` module
+======================
+
+This module declares the Recording class, a specification of the part of a run to keep (which time-series, which
+firms and every how many time-steps), and the RingSeries class of working buffers used by the Dynamics class when
+it is given a recording. A time-step only reads the state at time-steps t-1 and t and writes the one at t+1, so that
+the dynamics keeps its full internal state in buffers of three rows and copies the recorded rows at the end of each
+time-step, whatever the length of the run.
+"""
+import numpy as np
+
+
+class RingSeries(object):
+
+    def __init__(self, length, shape=(), depth=3):
+        """
+        Working buffer of a time-series keeping its last time-steps only.
+        :param length: number of time-steps of the time-series,
+        :param shape: shape of the time-series at each time-step,
+        :param depth: number of time-steps kept.
+        """
+        self.length = length
+        self.depth = depth
+        self.data = np.zeros((depth,) + tuple(shape))
+
+    @property
+    def shape(self):
+        return (self.length,) + self.data.shape[1:]
+
+    def __len__(self):
+        return self.length
+
+    def row(self, key):
+        """
+        :param key: time-step, or tuple of a time-step and indices of the values at that time-step,
+        :return: Key of the buffer.
+        """
+        t, rest = (key[0], key[1:]) if isinstance(key, tuple) else (key, ())
+        if not isinstance(t, (int, np.integer)):
+            raise IndexError('Only the last %d time-steps are kept, use the recorded time-series' % self.depth)
+        return (t % self.depth,) + rest
+
+    def __getitem__(self, key):
+        return self.data[self.row(key)]
+
+    def __setitem__(self, key, value):
+        self.data[self.row(key)] = value
+
+    def extend(self, k):
+        self.length += k
+
+    def truncate(self, length):
+        self.length = length
+
+
+class Recording(object):
+
+    # Time-series indexed by firm
+    firm_series = ('prices', 'prods', 'targets', 'stocks')
+
+    # Time-series that can be recorded, times being always kept and non-rescaled prices being only set at the first
+    # time-step from the initial prices p0
+    channels = ('prices', 'wages', 'prods', 'targets', 'stocks', 'edge_stocks', 'q_exchange',
+                'q_demand', 'labour', 'utilities', 'budgets')
+
+    def __init__(self, channels=None, firms=None, stride=1):
+        """
+        :param channels: names of the recorded time-series, default is all of them,
+        :param firms: indices (or boolean mask) of the recorded firms, default is all of them; edge-lists keep the
+        consumptions of their goods and the edges of their inputs,
+        :param stride: number of time-steps between recorded time-steps, the first time-step being recorded.
+        """
+        channels = tuple(channels) if channels is not None else self.channels
+        for name in channels:
+            if name not in self.channels:
+                raise ValueError('Unknown channel %s' % name)
+        if stride < 1:
+            raise ValueError('The stride must be a positive number of time-steps')
+        self.record_channels = channels
+        self.firms = firms
+        self.stride = int(stride)
+
+    def columns(self, dyn):
+        """
+        :param dyn: dynamics,
+        :return: Dictionary of the recorded columns of the time-series by name, None to record every column.
+        """
+        if self.firms is None:
+            return {name: None for name in self.record_channels}
+        firms = np.zeros(dyn.n, dtype=bool)
+        firms[self.firms] = True
+        edges = firms[dyn.eco.edge_rows]
+        columns = {'q_exchange': np.concatenate((firms, edges)), 'q_demand': np.concatenate((firms, edges)),
+                   'edge_stocks': edges[dyn.stock_edges]}
+        columns.update({name: firms for name in self.firm_series})
+        return {name: np.nonzero(columns[name])[0] if name in columns else None for name in self.record_channels}
+
+    def recorded(self, t):
+        """
+        :param t: time-step,
+        :return: Whether or not time-step t is recorded.
+        """
+        return (t - 1) % self.stride == 0
@@ -0,0 +1,102 @@
+# network-economy is a simulation program for the Network Economy ABM desbribed in (TODO)
+# Copyright (C) 2020 Théo Dessertaine
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+The ``shared`` module
+======================
+
+This module declares the SharedEconomy class which publishes an economy once in a shared memory segment, and the
+attach function with which the workers of a process pool rebuild it read-only on top of that segment. Only a small
+descriptor is sent to workers, instead of a pickled copy of every n by n network, and each worker owns nothing but its
+Dynamics state.
+
+Usage:
+    with SharedEconomy(e) as shared, ProcessPoolExecutor() as executor:
+        results = executor.map(task, itertools.repeat(shared.descriptor), parameters)
+
+where task calls attach(descriptor) to get the economy. Segments are reference-counted by the resource tracker of the
+publishing process, so workers must be started by it, as in multiprocessing or concurrent.futures pools.
+"""
+import sys
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+
+from economy import Economy
+
+# Alignment in bytes of arrays in the shared memory segment
+ALIGNMENT = 64
+
+# Economies attached by the current process, by name of segment
+_attached = {}
+
+
+class SharedEconomy(object):
+
+    def __init__(self, e):
+        """
+        Copies the arrays of an economy into a new shared memory segment.
+        :param e: economy class, with computed equilibrium.
+        """
+        meta, arrays = e.get_state()
+        layout, size = [], 0
+        for key, value in arrays.items():
+            value = np.asarray(value)
+            layout.append((key, value.dtype.str, value.shape, size))
+            size += -(-value.nbytes // ALIGNMENT) * ALIGNMENT
+        self.shm = SharedMemory(create=True, size=max(size, 1))
+        for key, dtype, shape, offset in layout:
+            np.ndarray(shape, dtype=dtype, buffer=self.shm.buf, offset=offset)[...] = arrays[key]
+        # Picklable description of the segment sent to workers
+        self.descriptor = {'name': self.shm.name, 'meta': meta, 'layout': layout}
+
+    def close(self):
+        """
+        Releases and destroys the shared memory segment, economies attached to it must not be used afterwards.
+        :return: side effect
+        """
+        _attached.pop(self.shm.name, None)
+        self.shm.close()
+        self.shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def attach(descriptor):
+    """
+    Rebuilds a published economy on top of its shared memory segment, the economy being cached for later tasks of the
+    same process. Networks and parameters are read-only views of the segment.
+    :param descriptor: descriptor of a SharedEconomy,
+    :return: Economy.
+    """
+    name = descriptor['name']
+    if name not in _attached:
+        if sys.version_info >= (3, 13):
+            shm = SharedMemory(name=name, track=False)
+        else:
+            shm = SharedMemory(name=name)
+        arrays = {}
+        for key, dtype, shape, offset in descriptor['layout']:
+            arrays[key] = np.ndarray(shape, dtype=dtype, buffer=shm.buf, offset=offset)
+            arrays[key].flags.writeable = False
+        e = Economy.from_state(descriptor['meta'], arrays)
+        e.shared_memory = shm  # Keeps the segment mapped as long as the economy lives
+        _attached[name] = e
+    return _attached[name]
@@ -0,0 +1,159 @@
+# network-economy is a simulation program for the Network Economy ABM desbribed in (TODO)
+# Copyright (C) 2020 Théo Dessertaine
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+The ``shocks`` module
+======================
+
+This module declares the ShockExperiment class for impulse-response studies. The dynamics is run once up to the time
+of the shocks and checkpointed; every shocked branch, and the unshocked one, is then continued from this checkpoint on
+its own copy of the economy. Copies share the networks of the original economy and only duplicate the firms and
+household parameters that shocks modify. Shocks are picklable callables applied to the copies, such as the
+ProductivityShock and PreferenceShock classes, so that branches can be run by the map of a process pool.
+"""
+import copy
+
+import numpy as np
+
+from dynamics import Dynamics
+
+
+class ProductivityShock(object):
+
+    def __init__(self, firms, size):
+        """
+        :param firms: indices (or boolean mask) of the shocked firms,
+        :param size: relative change of their productivity factors.
+        """
+        self.firms = firms
+        self.size = size
+
+    def __call__(self, e):
+        z = np.array(e.firms.z, dtype=float)
+        z[self.firms] *= 1 + self.size
+        e.update_firms_z(z)
+
+
+class PreferenceShock(object):
+
+    def __init__(self, goods, size):
+        """
+        :param goods: indices (or boolean mask) of the goods whose preference factors are shocked,
+        :param size: relative change of the preference factors.
+        """
+        self.goods = goods
+        self.size = size
+
+    def __call__(self, e):
+        theta = np.array(e.house.theta, dtype=float)
+        theta[..., self.goods] *= 1 + self.size
+        e.update_house_theta(theta)
+
+
+def run_branch(e, checkpoint, settings, shock=None):
+    """
+    Continues the dynamics from a checkpoint on a copy of the economy, after applying a shock to the copy.
+    :param e: economy class,
+    :param checkpoint: checkpoint of the dynamics at the time of the shock,
+    :param settings: dictionary of the arguments of Dynamics and simulation time after the shock (t_response),
+    :param shock: callable modifying the copy of the economy, None for the unshocked branch,
+    :return: Dynamics of the branch, whose time-series are only filled from the time of the shock.
+    """
+    branch = copy.copy(e)
+    branch.firms = copy.deepcopy(e.firms)
+    branch.house = copy.deepcopy(e.house)
+    if shock:
+        shock(branch)
+    dyn = Dynamics(branch, settings['t_shock'], step_size=settings['step_size'], lda=settings['lda'],
+                   nu=settings['nu'])
+    dyn.set_checkpoint(checkpoint)
+    dyn.continue_dynamics(settings['t_response'])
+    return dyn
+
+
+class ShockExperiment(object):
+
+    # Time-series whose responses are given as log-deviations from the unshocked branch. Wages are stored as the growth
+    # factors of each time-step, whose log-deviations are cumulated into the response of the wage level
+    responses = ('prices', 'wages', 'prods', 'labour')
+
+    def __init__(self, e, t_shock, t_response, step_size=None, lda=None, nu=None):
+        """
+        :param e: economy class, with computed equilibrium,
+        :param t_shock: simulation time before the shocks,
+        :param t_response: simulation time after the shocks,
+        :param step_size: size of time-steps,
+        :param lda: share of demands in firms' forecasts,
+        :param nu: confidence of the household.
+        """
+        self.eco = e
+        self.settings = {'t_shock': t_shock, 't_response': t_response, 'step_size': step_size, 'lda': lda, 'nu': nu}
+        self.prefix = None  # Dynamics up to the time of the shocks
+        self.checkpoint = None  # Checkpoint of the dynamics at the time of the shocks
+        self.baseline = None  # Dynamics of the unshocked branch
+
+    def run_prefix(self, p0, w0, g0, t1, s0, B0):
+        """
+        Runs the dynamics from initial conditions up to the time of the shocks and checkpoints it.
+        :param p0: initial prices,
+        :param w0: initial wage,
+        :param g0: initial productions,
+        :param t1: initial targets,
+        :param s0: initial stocks,
+        :param B0: initial savings,
+        :return: side-effect
+        """
+        self.prefix = Dynamics(self.eco, self.settings['t_shock'], step_size=self.settings['step_size'],
+                               lda=self.settings['lda'], nu=self.settings['nu'])
+        self.prefix.set_initial_conditions(p0, w0, g0, t1, s0, B0)
+        self.prefix.discrete_dynamics()
+        self.checkpoint = self.prefix.get_checkpoint()
+        self.baseline = None
+
+    def run(self, shocks, map_function=map):
+        """
+        Forks the shocked branches, and the unshocked one if not run yet, from the checkpoint.
+        :param shocks: dictionary of shocks by name,
+        :param map_function: map-like function applying run_branch to iterables of its arguments, e.g. the map method
+        of a concurrent.futures executor,
+        :return: Dictionary of the impulse responses by name of shock, see impulse_response.
+        """
+        if self.checkpoint is None:
+            raise Exception("No prefix to fork from, run run_prefix first.")
+        names = list(shocks)
+        branches = [shocks[name] for name in names]
+        if self.baseline is None:
+            branches.append(None)
+        k = len(branches)
+        dyns = list(map_function(run_branch, [self.eco] * k, [self.checkpoint] * k, [self.settings] * k, branches))
+        if self.baseline is None:
+            self.baseline = dyns.pop()
+        return {name: self.impulse_response(dyn) for name, dyn in zip(names, dyns)}
+
+    def impulse_response(self, dyn):
+        """
+        :param dyn: dynamics of a shocked branch,
+        :return: Dictionary of the times since the shock and of the log-deviations of the time-series of the branch
+        from the unshocked branch, the first entry being the time of the shock. Prices are wage-rescaled and the
+        response of wages is the one of the wage level.
+        """
+        t = int(self.checkpoint['t'])
+        response = {'times': dyn.times[t:] - dyn.times[t]}
+        with np.errstate(all='ignore'):
+            for name in self.responses:
+                response[name] = np.log(getattr(dyn, name)[t:] / getattr(self.baseline, name)[t:])
+        response['wages'] = np.cumsum(response['wages'])
+        return response
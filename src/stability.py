@@ -0,0 +1,271 @@
+# network-economy is a simulation program for the Network Economy ABM desbribed in (TODO)
+# Copyright (C) 2020 Théo Dessertaine
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+The ``stability`` module
+======================
+
+This module declares the StepMap class which views one full step of the discrete dynamics (planning, exchanges,
+production and household optimization) as a map on the state stored in checkpoints, along with functions for the
+linear stability analysis of this map around the equilibrium of an economy. The Jacobian is computed by central finite
+differences, either as a dense matrix or matrix-free for a sparse eigen-solve. The rest point of the map, which is
+not the equilibrium of the economy with decreasing returns to scale, depreciation or savings, is found by Anderson
+acceleration or Newton-Krylov iterations.
+
+At the equilibrium supplies and demands are equal, so that the rationing of the exchanges is at its kink: the map is
+only piecewise smooth there and central differences average its one-sided derivatives, which makes matrix-free
+products slightly direction-dependent. With a Leontief production function every input is binding at the equilibrium
+and the linearization is not informative.
+"""
+import numpy as np
+
+from dynamics import Dynamics
+
+
+class StepMap(object):
+
+    # Checkpoint entries that make up the state of the dynamics at the beginning of a time-step
+    state_keys = ('prices', 'prods', 'stocks', 'edge_stocks', 'q_demand', 'q_exchange', 'cons_targets',
+                  'labour_offers', 'savings')
+
+    def __init__(self, dyn, checkpoint):
+        """
+        :param dyn: dynamics used to carry out the steps,
+        :param checkpoint: checkpoint of the dynamics at which the map is evaluated, as given by get_checkpoint.
+        """
+        self.dyn = dyn
+        self.t = int(checkpoint['t'])
+        self.checkpoint = {key: np.array(value) for key, value in checkpoint.items()}
+        self.shapes = [np.shape(self.checkpoint[key]) for key in self.state_keys]
+        self.sizes = [int(np.prod(shape)) for shape in self.shapes]
+        if len(self.dyn.prices) < self.t + 2:
+            self.dyn.extend_time_series(self.t + 2 - len(self.dyn.prices))
+
+    def pack(self, checkpoint):
+        """
+        :param checkpoint: checkpoint of the dynamics,
+        :return: State vector.
+        """
+        return np.concatenate([np.ravel(checkpoint[key]) for key in self.state_keys])
+
+    def split(self, x):
+        """
+        :param x: state vector (or eigenmode),
+        :return: Dictionary of the state components.
+        """
+        parts = np.split(x, np.cumsum(self.sizes)[:-1])
+        return {key: part.reshape(shape) for key, part, shape in zip(self.state_keys, parts, self.shapes)}
+
+    def __call__(self, x):
+        """
+        Carries out one time-step from a given state.
+        :param x: state vector,
+        :return: State vector at the next time-step.
+        """
+        checkpoint = dict(self.checkpoint)
+        checkpoint.update(self.split(x))
+        self.dyn.set_checkpoint(checkpoint)
+        self.dyn.planning(self.t)
+        self.dyn.exchanges_and_updates(self.t)
+        self.dyn.production(self.t)
+        self.dyn.current_t = self.t + 1
+        return self.pack(self.dyn.get_checkpoint())
+
+    def jvp(self, x, v, eps=1e-6):
+        """
+        Product of the Jacobian of the map with a vector by central finite differences.
+        :param x: state vector,
+        :param v: direction,
+        :param eps: relative size of the finite differences,
+        :return: Jacobian-vector product.
+        """
+        norm = np.linalg.norm(v)
+        if norm == 0:
+            return np.zeros(len(x))
+        h = eps * (1 + np.linalg.norm(x)) / norm
+        return (self(x + h * v) - self(x - h * v)) / (2 * h)
+
+    def jacobian(self, x, eps=1e-6):
+        """
+        Dense Jacobian of the map by central finite differences.
+        :param x: state vector,
+        :param eps: relative size of the finite differences,
+        :return: Jacobian matrix.
+        """
+        jac = np.zeros((len(x), len(x)))
+        for k in range(len(x)):
+            h = eps * max(abs(x[k]), 1)
+            dx = np.zeros(len(x))
+            dx[k] = h
+            jac[:, k] = (self(x + dx) - self(x - dx)) / (2 * h)
+        return jac
+
+
+def equilibrium_checkpoint(e, t=3, step_size=None, lda=None, nu=None):
+    """
+    Runs the dynamics from the equilibrium of the economy, without inventories nor savings, for a few time-steps.
+    :param e: economy class, with computed equilibrium,
+    :param t: number of time-steps to run,
+    :param step_size: size of time-steps,
+    :param lda: share of demands in firms' forecasts,
+    :param nu: confidence of the household,
+    :return: Dynamics and its checkpoint at time-step t.
+    """
+    step_s = step_size if step_size else 1
+    dyn = Dynamics(e, (t + 1) * step_s - 1, step_size=step_size, lda=lda, nu=nu)
+    dyn.set_initial_conditions(e.p_eq, 1, e.g_eq, e.g_eq, np.zeros(e.n), 0)
+    dyn.discrete_dynamics()
+    return dyn, dyn.get_checkpoint()
+
+
+def linear_stability(e, k=6, eps=1e-6, dense_max=200, step_size=None, lda=None, nu=None):
+    """
+    Linear stability analysis of the discrete dynamics around the equilibrium of an economy. The Jacobian of one
+    time-step is computed densely for states of size at most dense_max, and its leading eigenvalues are otherwise
+    found by a sparse eigen-solve on Jacobian-vector products. The dense Jacobian costs two time-steps per entry of the
+    state, which grows as the number of edges, so that it is kept for small economies.
+    :param e: economy class, with computed equilibrium,
+    :param k: number of leading eigenvalues and eigenmodes to return,
+    :param eps: relative size of the finite differences,
+    :param dense_max: largest size of the state for which the Jacobian is computed densely,
+    :param step_size: size of time-steps,
+    :param lda: share of demands in firms' forecasts,
+    :param nu: confidence of the household,
+    :return: Dictionary with the spectral radius, leading eigenvalues (by decreasing modulus) and eigenmodes (columns,
+    to be split with the step map), whether the equilibrium is stable and its leading mode oscillating, the relative
+    residual of the equilibrium state under one step and the step map.
+    """
+    dyn, checkpoint = equilibrium_checkpoint(e, step_size=step_size, lda=lda, nu=nu)
+    step = StepMap(dyn, checkpoint)
+    x = step.pack(checkpoint)
+    residual = np.linalg.norm(step(x) - x) / np.linalg.norm(x)
+
+    if len(x) <= dense_max:
+        values, modes = np.linalg.eig(step.jacobian(x, eps))
+    else:
+        from scipy.sparse.linalg import LinearOperator, eigs
+        operator = LinearOperator((len(x), len(x)), matvec=lambda v: step.jvp(x, np.real(np.ravel(v)), eps),
+                                  dtype=float)
+        values, modes = eigs(operator, k=min(k, len(x) - 2), which='LM')
+    order = np.argsort(- np.abs(values))[:k]
+    values, modes = values[order], modes[:, order]
+
+    return {'spectral_radius': np.abs(values[0]),
+            'eigenvalues': values,
+            'modes': modes,
+            'stable': np.abs(values[0]) < 1,
+            'oscillating': values[0].imag != 0 or values[0].real < 0,
+            'residual': residual,
+            'step_map': step}
+
+
+def anderson(step, x, tol=1e-10, max_iter=1000, memory=30, damping=1.):
+    """
+    Solves x = step(x) by Anderson acceleration of the damped fixed-point iterations. The history is restarted once it
+    holds memory iterations, which is more robust than a sliding window where the rest point lies on the kink of the
+    rationing. It is also restarted when an extrapolated state leaves the domain of the map (non-finite image), or
+    when the residual grows by orders of magnitude, the iteration then falling back to a plain damped step.
+    :param step: map,
+    :param x: initial state,
+    :param tol: tolerance on the relative residual |step(x) - x| / (1 + |x|), in maximum norm,
+    :param max_iter: maximum number of iterations,
+    :param memory: number of previous iterations used in the extrapolation,
+    :param damping: mixing parameter of the iterations,
+    :return: State, relative residual and number of iterations.
+    """
+    dx, df = [], []  # Differences of successive states and residuals
+    f = step(x) - x
+    best = np.inf
+    for iteration in range(max_iter):
+        residual = np.max(np.abs(f)) / (1 + np.max(np.abs(x)))
+        if not np.isfinite(residual):
+            raise ArithmeticError('The map is not defined at the initial state')
+        if residual <= tol:
+            return x, residual, iteration
+        best = min(best, residual)
+        x_new = x + damping * f
+        if df:
+            gamma = np.linalg.lstsq(np.column_stack(df), f, rcond=None)[0]
+            x_new = x_new - np.column_stack(dx) @ gamma - damping * (np.column_stack(df) @ gamma)
+        f_new = step(x_new) - x_new
+        if df and not (np.all(np.isfinite(f_new)) and
+                       np.max(np.abs(f_new)) / (1 + np.max(np.abs(x_new))) < 1e4 * best):
+            dx, df = [], []
+            x_new = x + damping * f
+            f_new = step(x_new) - x_new
+        dx.append(x_new - x)
+        df.append(f_new - f)
+        if len(df) >= memory:
+            dx, df = [], []
+        x, f = x_new, f_new
+    residual = np.max(np.abs(f)) / (1 + np.max(np.abs(x)))
+    return x, residual, max_iter
+
+
+def steady_state(e, method='anderson', tol=1e-10, max_iter=1000, memory=30, damping=1., step_size=None, lda=None,
+                 nu=None):
+    """
+    Rest point of the discrete dynamics, which differs from the equilibrium of the economy with decreasing returns to
+    scale, depreciation or savings. One time-step is the map of a StepMap from the equilibrium checkpoint, and its
+    fixed point is solved by Anderson acceleration or by Newton-Krylov iterations on finite-difference Jacobian-vector
+    products. The latter converge faster near a smooth rest point, but the map is only piecewise smooth where supplies
+    and demands are equal.
+    :param e: economy class, with computed equilibrium,
+    :param method: 'anderson' or 'newton-krylov',
+    :param tol: tolerance on the relative residual of the state under one step, in maximum norm,
+    :param max_iter: maximum number of iterations,
+    :param memory: number of previous iterations used by Anderson acceleration,
+    :param damping: mixing parameter of Anderson acceleration,
+    :param step_size: size of time-steps,
+    :param lda: share of demands in firms' forecasts,
+    :param nu: confidence of the household,
+    :return: Dictionary with the checkpoint of the rest point (from which the dynamics can be continued), whether
+    the iterations converged, the relative residual and the numbers of iterations and of evaluations of the map.
+    """
+    dyn, checkpoint = equilibrium_checkpoint(e, step_size=step_size, lda=lda, nu=nu)
+    step = StepMap(dyn, checkpoint)
+    evaluations = [0]
+
+    def counted(x):
+        evaluations[0] += 1
+        return step(x)
+
+    x = step.pack(checkpoint)
+    if method == 'anderson':
+        x, residual, iterations = anderson(counted, x, tol, max_iter, memory, damping)
+    elif method == 'newton-krylov':
+        from scipy.optimize import NoConvergence, newton_krylov
+        norm = 1 + np.max(np.abs(x))
+        iterations = [0]
+
+        def callback(*args):
+            iterations[0] += 1
+        try:
+            x = newton_krylov(lambda y: counted(y) - y, x, f_tol=tol * norm, maxiter=max_iter, callback=callback)
+        except NoConvergence as error:
+            x = error.args[0]
+        iterations = iterations[0]
+        residual = np.max(np.abs(counted(x) - x)) / (1 + np.max(np.abs(x)))
+    else:
+        raise ValueError('Unknown method %s' % method)
+
+    rest = dict(step.checkpoint)
+    rest.update(step.split(x))
+    return {'checkpoint': rest,
+            'converged': bool(residual <= tol),
+            'residual': residual,
+            'iterations': iterations,
+            'evaluations': evaluations[0]}
@@ -0,0 +1,107 @@
+# network-economy is a simulation program for the Network Economy ABM desbribed in (TODO)
+# Copyright (C) 2020 Théo Dessertaine
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+The ``stochastic`` module
+======================
+
+This module declares the Noise class of per-step multiplicative shocks on the productivity factors z, the preference
+factors theta and the labour supply, given to the Dynamics class, and the run_ensemble function running noisy
+realisations of the dynamics. Shocks are log-normal with unit mean and a log-variance proportional to the step size.
+They are drawn from counter-based Philox streams whose key is the (seed, run) pair and whose counter holds the
+time-step and the shocked quantity, the position in the draw being the firm (or household). Shocks are thus recomputed
+rather than stored, and a realisation only depends on its run number, whatever the partition of runs across
+workers.
+"""
+import numpy as np
+
+from dynamics import Dynamics
+
+
+class Noise(object):
+
+    # Shocked quantities, in the order of their streams
+    channels = ('z', 'theta', 'labour')
+
+    def __init__(self, seed, run=0, z=0, theta=0, labour=0):
+        """
+        :param seed: seed of the ensemble,
+        :param run: number of the realisation,
+        :param z: volatility of the productivity factors, per unit of time,
+        :param theta: volatility of the preference factors, per unit of time,
+        :param labour: volatility of the labour supply, per unit of time.
+        """
+        self.seed = seed
+        self.run = run
+        self.volatilities = {'z': z, 'theta': theta, 'labour': labour}
+
+    def for_run(self, run):
+        """
+        :param run: number of a realisation,
+        :return: Noise of the same ensemble for that realisation.
+        """
+        return Noise(self.seed, run, **self.volatilities)
+
+    def factors(self, channel, t, size, step_s):
+        """
+        :param channel: shocked quantity, one of 'z', 'theta' or 'labour',
+        :param t: time-step,
+        :param size: number of firms (or households),
+        :param step_s: size of the time-step,
+        :return: Multiplicative shocks of the time-step, None if the quantity is not shocked.
+        """
+        volatility = self.volatilities[channel]
+        if not volatility:
+            return None
+        # The first word of the counter is incremented by the draws of a time-step, the others identify it
+        counter = [0, 0, t, self.channels.index(channel)]
+        generator = np.random.Generator(np.random.Philox(key=[self.seed, self.run], counter=counter))
+        scale = volatility * np.sqrt(step_s)
+        return np.exp(scale * generator.standard_normal(size) - scale * scale / 2)
+
+
+def run_realisation(e, t_max, noise, initial_conditions, kwargs):
+    """
+    :param e: economy class,
+    :param t_max: simulation time,
+    :param noise: noise of the realisation,
+    :param initial_conditions: initial conditions (p0, w0, g0, t1, s0, B0),
+    :param kwargs: other arguments of Dynamics,
+    :return: Recorded time-series of the realisation if a recording is given, its dynamics otherwise.
+    """
+    dyn = Dynamics(e, t_max, noise=noise, **kwargs)
+    dyn.set_initial_conditions(*initial_conditions)
+    dyn.discrete_dynamics()
+    return dyn.get_records() if dyn.recording else dyn
+
+
+def run_ensemble(e, t_max, noise, runs, initial_conditions, map_function=map, **kwargs):
+    """
+    Runs noisy realisations of the dynamics.
+    :param e: economy class, with computed equilibrium,
+    :param t_max: simulation time,
+    :param noise: noise of the ensemble,
+    :param runs: numbers of the realisations,
+    :param initial_conditions: initial conditions (p0, w0, g0, t1, s0, B0),
+    :param map_function: map-like function applying run_realisation to iterables of its arguments, e.g. the map
+    method of a concurrent.futures executor,
+    :param kwargs: other arguments of Dynamics, such as a recording,
+    :return: List of the recorded time-series (or dynamics) of the realisations, in the order of runs.
+    """
+    runs = list(runs)
+    k = len(runs)
+    return list(map_function(run_realisation, [e] * k, [t_max] * k, [noise.for_run(run) for run in runs],
+                             [initial_conditions] * k, [kwargs] * k))
@@ -0,0 +1,289 @@
+# network-economy is a simulation program for the Network Economy ABM desbribed in (TODO)
+# Copyright (C) 2020 Théo Dessertaine
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+The ``sweep`` module
+======================
+
+This module declares the Sweep class, a work queue of parameter sweeps stored in a SQLite file which any number of
+worker processes, on any number of nodes sharing the file, claim tasks from. A claimed task is leased to its worker for
+a given time, renewed while it runs; tasks whose lease expired, because their worker died, are claimed again, and
+failed tasks are retried up to a maximum number of attempts. Tasks are identified by a hash of their parameters so
+that adding a task that is already queued or done is a no-op.
+
+Usage:
+    python src/sweep.py add sweep.db tasks.json
+    python src/sweep.py work sweep.db sweep:classification_task
+    python src/sweep.py status sweep.db
+
+The database uses the default rollback journal rather than WAL, which requires all processes on the same host. On
+network filesystems, their locking must be functional (e.g. NFS with lockd).
+"""
+import argparse
+import hashlib
+import importlib
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import traceback
+from contextlib import contextmanager
+
+import numpy as np
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    id INTEGER PRIMARY KEY,
+    key TEXT UNIQUE NOT NULL,
+    params TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    worker TEXT,
+    lease_until REAL,
+    result TEXT,
+    error TEXT,
+    updated REAL
+);
+CREATE INDEX IF NOT EXISTS tasks_status ON tasks (status, lease_until);
+"""
+
+
+class Sweep(object):
+
+    def __init__(self, path, max_attempts=3, timeout=60):
+        """
+        :param path: SQLite file of the queue, created if needed,
+        :param max_attempts: number of attempts after which a failing task is given up,
+        :param timeout: time in seconds to wait for the lock of the database.
+        """
+        self.path = path
+        self.max_attempts = max_attempts
+        self.db = sqlite3.connect(path, timeout=timeout, isolation_level=None, check_same_thread=False)
+        self.lock = threading.Lock()  # Serializes the use of the connection by the lease renewal thread
+        self.db.executescript(SCHEMA)
+
+    @contextmanager
+    def transaction(self):
+        """
+        Write transaction taking the lock of the database from its beginning, so that concurrent claims are serialized.
+        """
+        with self.lock:
+            self.db.execute('BEGIN IMMEDIATE')
+            try:
+                yield
+            except BaseException:
+                self.db.execute('ROLLBACK')
+                raise
+            self.db.execute('COMMIT')
+
+    @staticmethod
+    def task_key(params):
+        """
+        :param params: dictionary of parameters,
+        :return: Hash of the parameters, independent of their order.
+        """
+        return hashlib.sha1(json.dumps(params, sort_keys=True).encode()).hexdigest()
+
+    def add(self, tasks):
+        """
+        Queues tasks, skipping the ones already in the queue whatever their status.
+        :param tasks: iterable of dictionaries of parameters (JSON-serializable),
+        :return: Number of new tasks.
+        """
+        rows = [(self.task_key(params), json.dumps(params, sort_keys=True)) for params in tasks]
+        with self.transaction():
+            before = self.db.total_changes
+            self.db.executemany('INSERT OR IGNORE INTO tasks (key, params) VALUES (?, ?)', rows)
+            return self.db.total_changes - before
+
+    def claim(self, worker, lease):
+        """
+        Claims a pending task, or a running one whose lease expired. Expired tasks that reached the maximum number of
+        attempts, whose workers kept dying, are given up.
+        :param worker: name of the worker,
+        :param lease: duration of the lease in seconds,
+        :return: Id and parameters of the task, None if there is no task to claim.
+        """
+        now = time.time()
+        with self.transaction():
+            self.db.execute("UPDATE tasks SET status = 'failed', error = 'lease expired', updated = ? WHERE "
+                            "status = 'running' AND lease_until < ? AND attempts >= ?", (now, now, self.max_attempts))
+            row = self.db.execute("SELECT id, params FROM tasks WHERE status = 'pending' OR "
+                                  "(status = 'running' AND lease_until < ?) ORDER BY id LIMIT 1", (now,)).fetchone()
+            if row:
+                self.db.execute("UPDATE tasks SET status = 'running', attempts = attempts + 1, worker = ?, "
+                                "lease_until = ?, updated = ? WHERE id = ?", (worker, now + lease, now, row[0]))
+        return (row[0], json.loads(row[1])) if row else None
+
+    def renew(self, task_id, worker, lease):
+        """
+        Extends the lease of a running task.
+        :param task_id: id of the task,
+        :param worker: name of the worker holding the lease,
+        :param lease: duration of the lease in seconds, from now,
+        :return: False if the worker lost the lease.
+        """
+        with self.lock:
+            cursor = self.db.execute("UPDATE tasks SET lease_until = ? WHERE id = ? AND worker = ? AND "
+                                     "status = 'running'", (time.time() + lease, task_id, worker))
+            return cursor.rowcount > 0
+
+    def complete(self, task_id, worker, result):
+        """
+        Records the result of a task, unless a result was already recorded by another worker.
+        :param task_id: id of the task,
+        :param worker: name of the worker,
+        :param result: JSON-serializable result,
+        :return: side effect
+        """
+        with self.lock:
+            self.db.execute("UPDATE tasks SET status = 'done', worker = ?, result = ?, error = NULL, updated = ? "
+                            "WHERE id = ? AND status != 'done'", (worker, json.dumps(result), time.time(), task_id))
+
+    def fail(self, task_id, worker, error):
+        """
+        Records the failure of a task, which is queued again unless it reached the maximum number of attempts.
+        :param task_id: id of the task,
+        :param worker: name of the worker,
+        :param error: description of the error,
+        :return: side effect
+        """
+        with self.lock:
+            self.db.execute("UPDATE tasks SET status = CASE WHEN attempts < ? THEN 'pending' ELSE 'failed' END, "
+                            "error = ?, lease_until = NULL, updated = ? WHERE id = ? AND worker = ? AND "
+                            "status = 'running'", (self.max_attempts, error, time.time(), task_id, worker))
+
+    def retry_failed(self):
+        """
+        Queues again the tasks that reached the maximum number of attempts.
+        :return: Number of tasks queued again.
+        """
+        with self.lock:
+            return self.db.execute("UPDATE tasks SET status = 'pending', attempts = 0 WHERE status = 'failed'").rowcount
+
+    def status(self):
+        """
+        :return: Dictionary of the number of tasks per status.
+        """
+        with self.lock:
+            return dict(self.db.execute('SELECT status, COUNT(*) FROM tasks GROUP BY status').fetchall())
+
+    def results(self):
+        """
+        :return: List of the parameters and results of completed tasks.
+        """
+        with self.lock:
+            rows = self.db.execute("SELECT params, result FROM tasks WHERE status = 'done' ORDER BY id").fetchall()
+        return [(json.loads(params), json.loads(result)) for params, result in rows]
+
+    def work(self, function, worker=None, lease=600, max_tasks=None):
+        """
+        Claims and runs tasks until none is left to claim. The lease of the running task is renewed in the background
+        every third of its duration, so that only tasks of dead workers are claimed again.
+        :param function: function called with the parameters of tasks as keyword arguments,
+        :param worker: name of the worker, default is host name and process id,
+        :param lease: duration of leases in seconds,
+        :param max_tasks: maximum number of tasks to run,
+        :return: Number of tasks run.
+        """
+        worker = worker if worker else '%s:%d' % (socket.gethostname(), os.getpid())
+        n_tasks = 0
+        while max_tasks is None or n_tasks < max_tasks:
+            task = self.claim(worker, lease)
+            if task is None:
+                break
+            task_id, params = task
+            done = threading.Event()
+            renewal = threading.Thread(target=self.keep_lease, args=(task_id, worker, lease, done), daemon=True)
+            renewal.start()
+            try:
+                result = function(**params)
+            except Exception:
+                done.set()
+                renewal.join()
+                self.fail(task_id, worker, traceback.format_exc())
+            else:
+                done.set()
+                renewal.join()
+                self.complete(task_id, worker, result)
+            n_tasks += 1
+        return n_tasks
+
+    def keep_lease(self, task_id, worker, lease, done):
+        while not done.wait(lease / 3):
+            if not self.renew(task_id, worker, lease):
+                break
+
+    def close(self):
+        self.db.close()
+
+
+def classification_task(eco, t_max, perturbation=0.05, step_size=None, lda=None, nu=None):
+    """
+    Task running the dynamics of an economy saved with save_eco from perturbed equilibrium prices and productions.
+    :param eco: directory of the saved economy, memory-mapped so that workers of a node share it,
+    :param t_max: simulation time,
+    :param perturbation: relative perturbation of equilibrium prices (positive) and productions (negative),
+    :param step_size: size of time-steps,
+    :param lda: share of demands in firms' forecasts,
+    :param nu: confidence of the household,
+    :return: Classification of the run and final distance to equilibrium.
+    """
+    from dynamics import Dynamics
+    from economy import Economy
+    from phase import classify_dynamics
+    e = Economy.load_eco(eco)
+    dyn = Dynamics(e, t_max, step_size=step_size, lda=lda, nu=nu)
+    dyn.set_initial_conditions((1 + perturbation) * e.p_eq, 1, (1 - perturbation) * e.g_eq, e.g_eq, np.zeros(e.n), 0)
+    dyn.discrete_dynamics()
+    return {'label': classify_dynamics(dyn), 'distance': float(dyn.norm_prices_prods_stocks().iloc[-1])}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Parameter sweeps of the Network Economy ABM.')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    parser_add = sub.add_parser('add', help='queue the tasks of a JSON list of parameters')
+    parser_add.add_argument('db')
+    parser_add.add_argument('tasks')
+
+    parser_work = sub.add_parser('work', help='run tasks until none is left')
+    parser_work.add_argument('db')
+    parser_work.add_argument('function', help='task function as module:function')
+    parser_work.add_argument('--lease', type=float, default=600)
+    parser_work.add_argument('--max-attempts', type=int, default=3)
+    parser_work.add_argument('--max-tasks', type=int, default=None)
+
+    parser_status = sub.add_parser('status', help='count tasks per status')
+    parser_status.add_argument('db')
+
+    args = parser.parse_args()
+    if args.command == 'add':
+        with open(args.tasks) as f:
+            print('%d new task(s)' % Sweep(args.db).add(json.load(f)))
+    elif args.command == 'work':
+        module, name = args.function.split(':')
+        function = getattr(importlib.import_module(module), name)
+        sweep = Sweep(args.db, max_attempts=args.max_attempts)
+        print('%d task(s) run' % sweep.work(function, lease=args.lease, max_tasks=args.max_tasks))
+    else:
+        print(Sweep(args.db).status())
+
+
+if __name__ == '__main__':
+    main()